@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import time
+import numpy as np
+from mandelbrot_parallel import compute_grid, fill_points
+from raster import save_image
+
+
+def zoom_frames(cx: float, cy: float, start_scale: float, end_scale: float,
+				frames: int, res: (int, int)) -> list:
+	"""
+	Bounds (xmin, xmax, ymin, ymax) of every frame of a zoom to cx+cy*i.
+
+
+	The scale is the width of the view, it shrinks by the same factor
+	every frame so the zoom looks steady. The height follows the
+	aspect ratio of res.
+	"""
+
+	views = []
+	for frame in range(frames):
+		t = frame/(frames - 1) if frames > 1 else 0.0
+		width = start_scale*(end_scale/start_scale)**t
+		height = width*res[1]/res[0]
+		views.append((cx - width/2, cx + width/2, cy - height/2, cy + height/2))
+	return views
+
+
+def resample_seeds(grid: np.ndarray, view: (float, float, float, float),
+				   new_view: (float, float, float, float), res: (int, int),
+				   seed_exterior: bool = False) -> np.ndarray:
+	"""
+	Guesses values of a new frame from the previous one.
+
+
+	A previous pixel is used as a seed only if its 3x3 neighbourhood
+	has the same value, so every new point that lands on it is well
+	inside a uniform region. Only the interior (value 0) is used unless
+	seed_exterior is set. Returns the guesses, -1 where there is none.
+	"""
+
+	uniform = np.zeros(grid.shape, dtype=bool)
+	uniform[1:-1, 1:-1] = True
+	for dx in (-1, 0, 1):
+		for dy in (-1, 0, 1):
+			uniform[1:-1, 1:-1] &= grid[1+dx:grid.shape[0]-1+dx, 1+dy:grid.shape[1]-1+dy] == grid[1:-1, 1:-1]
+	if not seed_exterior:
+		uniform &= grid == 0
+
+	# Nearest previous pixel of every new point
+	cx = np.linspace(new_view[0], new_view[1], res[0])
+	cy = np.linspace(new_view[2], new_view[3], res[1])
+	xIndex = np.rint((cx - view[0])/(view[1] - view[0])*(grid.shape[0] - 1)).astype(np.intp)
+	yIndex = np.rint((cy - view[2])/(view[3] - view[2])*(grid.shape[1] - 1)).astype(np.intp)
+	inside_x = (xIndex >= 0) & (xIndex < grid.shape[0])
+	inside_y = (yIndex >= 0) & (yIndex < grid.shape[1])
+
+	seeds = np.full(res, -1, dtype=np.int32)
+	xs = np.flatnonzero(inside_x)
+	ys = np.flatnonzero(inside_y)
+	found = uniform[np.ix_(xIndex[xs], yIndex[ys])]
+	values = grid[np.ix_(xIndex[xs], yIndex[ys])]
+	seeds[np.ix_(xs, ys)] = np.where(found, values, -1)
+	return seeds
+
+
+def render_seeded(view: (float, float, float, float), res: (int, int),
+				  escape_time: int, seeds: np.ndarray,
+				  skip_bulbs: bool = True, dtype=np.float64) -> (np.ndarray, int):
+	"""
+	Computes a frame where seeds holds guessed values, returns the
+	grid and the number of points computed.
+
+
+	Points without a guess are computed first. A guessed point is only
+	trusted if all eight neighbours have the same value, computed or
+	guessed, otherwise it is computed too. This repeats until every
+	guessed region is closed off by points of its own value, which is
+	the same border test Mariani-Silver uses. Like there, a filament
+	thinner than a pixel can cross a guessed region without touching a
+	computed point, so a few pixels of a frame may differ from a full
+	render.
+	"""
+
+	cx_range = np.linspace(view[0], view[1], res[0], dtype=dtype)
+	cy_range = np.linspace(view[2], view[3], res[1], dtype=dtype)
+	grid = np.full(res, -1, dtype=np.int32)
+	computed = seeds < 0
+	todo = computed
+
+	total = 0
+	while True:
+		xs, ys = np.nonzero(todo)
+		fill_points(cx_range, cy_range, xs, ys, escape_time, skip_bulbs, grid)
+		total += xs.size
+
+		# Known values, the guesses stand in for points not computed yet.
+		# The edge of the image is never trusted since it has nothing
+		# around it
+		values = np.where(computed, grid, seeds)
+		padded = np.pad(values, 1, constant_values=-2)
+		trusted = np.ones(res, dtype=bool)
+		for dx, dy in ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)):
+			neighbour = padded[1+dx:res[0]+1+dx, 1+dy:res[1]+1+dy]
+			trusted &= neighbour == seeds
+		todo = ~computed & ~trusted
+		if not todo.any():
+			break
+		computed = computed | todo
+
+	grid[~computed] = seeds[~computed]
+	return grid, total
+
+
+def render_animation(cx: float, cy: float, start_scale: float, end_scale: float,
+					 frames: int, res: (int, int), escape_time: int = 1000,
+					 pattern: str = "frame_{:05d}.png", reuse: bool = True,
+					 seed_exterior: bool = False, dtype=np.float64, **palette) -> list:
+	"""
+	Renders a zoom to cx+cy*i as numbered PNGs in one process.
+
+
+	The numba kernels are compiled once and their threads are kept for
+	every frame. With reuse each frame is seeded from the one before,
+	see render_seeded. Every frame is written as soon as it's done,
+	pattern is formatted with the frame number. Returns the time and
+	share of computed points of every frame.
+	"""
+
+	# Compiles the kernels before the first frame
+	compute_grid(-2., 2., -2., 2., (8, 8), 10, dtype=dtype)
+	render_seeded((-2., 2., -2., 2.), (8, 8), 10, np.full((8, 8), -1, dtype=np.int32), dtype=dtype)
+
+	stats = []
+	previous = None
+	for frame, view in enumerate(zoom_frames(cx, cy, start_scale, end_scale, frames, res)):
+		start = time.perf_counter()
+		if reuse and previous is not None:
+			seeds = resample_seeds(previous[0], previous[1], view, res, seed_exterior)
+			grid, computed = render_seeded(view, res, escape_time, seeds, dtype=dtype)
+		else:
+			grid = compute_grid(*view, res, escape_time, dtype=dtype)
+			computed = grid.size
+		elapsed = time.perf_counter() - start
+
+		filename = pattern.format(frame)
+		save_image(grid, filename, **palette)
+		stats.append({"frame": frame, "file": filename, "view": view,
+					  "time_s": elapsed, "computed": computed/grid.size})
+		previous = (grid, view)
+	return stats
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from mandelbrot_parallel import fill_batch, compute_grid
+
+
+def viewport(spec) -> (tuple, (int, int), int):
+	"""
+	Splits a spec (xmin, xmax, ymin, ymax, res) or
+	(xmin, xmax, ymin, ymax, res, escape_time) into bounds, res and
+	escape_time, which defaults to 1000 like the engines.
+	"""
+
+	if len(spec) not in (5, 6):
+		raise ValueError("a viewport is (xmin, xmax, ymin, ymax, res[, escape_time]), got {}".format(spec))
+	escape_time = spec[5] if len(spec) == 6 else 1000
+	return tuple(spec[:4]), tuple(spec[4]), escape_time
+
+
+def linspaces(starts: np.ndarray, stops: np.ndarray, nums: np.ndarray,
+			  dtype=np.float64) -> np.ndarray:
+	"""
+	np.linspace(starts[i], stops[i], nums[i]) of every i, one after
+	another in a single array.
+
+
+	Same steps as np.linspace, a multiply and an add in float64 and the
+	last point set to stop, so the points are identical to it. One
+	linspace call per view took longer than the kernel for thumbnails.
+	"""
+
+	starts = np.asarray(starts, dtype=np.float64)
+	stops = np.asarray(stops, dtype=np.float64)
+	nums = np.asarray(nums, dtype=np.int64)
+	first = np.concatenate(([0], np.cumsum(nums)[:-1]))
+	index = np.arange(nums.sum()) - np.repeat(first, nums)
+	div = np.maximum(nums - 1, 1)
+	step = np.where(nums > 1, (stops - starts)/div, 0.0)
+
+	points = index*np.repeat(step, nums)
+	points += np.repeat(starts, nums)
+	last = (first + nums - 1)[nums > 1]
+	points[last] = stops[nums > 1]
+	return points.astype(dtype)
+
+
+def pack(specs: list, indices: list, dtype=np.float64) -> list:
+	"""
+	Renders the views at indices of specs in one fill_batch call,
+	returns (index, grid) of each.
+	"""
+
+	views = [viewport(specs[index]) for index in indices]
+	bounds = np.array([view[0] for view in views], dtype=np.float64).reshape((-1, 4))
+	nx = np.array([view[1][0] for view in views], dtype=np.int64)
+	ny = np.array([view[1][1] for view in views], dtype=np.int64)
+	escape_times = np.array([view[2] for view in views], dtype=np.int64)
+
+	# Where every view starts in the packed ranges and in out
+	x_start = np.concatenate(([0], np.cumsum(nx)[:-1]))
+	y_start = np.concatenate(([0], np.cumsum(ny)[:-1]))
+	sizes = nx*ny
+	out_start = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+	# Same points as a single compute_grid of every view
+	cx_ranges = linspaces(bounds[:, 0], bounds[:, 1], nx, dtype)
+	cy_ranges = linspaces(bounds[:, 2], bounds[:, 3], ny, dtype)
+	row_view = np.repeat(np.arange(len(views)), nx)
+	out = np.empty(sizes.sum(), dtype=np.int32)
+	fill_batch(cx_ranges, cy_ranges, row_view, x_start, y_start, ny, out_start,
+			   escape_times, True, out)
+
+	return [(index, out[out_start[view]:out_start[view] + sizes[view]].reshape((nx[view], ny[view])))
+			for view, index in enumerate(indices)]
+
+
+def iter_batch(specs: list, ordered: bool = True, batch_points: int = 1 << 20,
+			   dtype=np.float64):
+	"""
+	Renders many viewports and yields (index, grid) for each, index
+	being its place in specs.
+
+
+	Small views are packed together until a batch holds batch_points
+	points, every batch is a single call to the warm fill_batch kernel
+	on numba's thread pool, so there is no engine object or compile per
+	view. Views bigger than batch_points are rendered alone with
+	compute_grid. With ordered the results come in the order of specs,
+	otherwise the smallest views are rendered first and every batch is
+	yielded as soon as it's done. The grids count down like
+	compute_grid, 0 is inside the set.
+	"""
+
+	order = list(range(len(specs)))
+	if not ordered:
+		order.sort(key=lambda index: np.prod(viewport(specs[index])[1]))
+
+	batch = []
+	batch_size = 0
+	for index in order:
+		bounds, res, escape_time = viewport(specs[index])
+		size = res[0]*res[1]
+		if batch and batch_size + size > batch_points:
+			yield from pack(specs, batch, dtype)
+			batch = []
+			batch_size = 0
+		if size > batch_points:
+			yield index, compute_grid(*bounds, res, escape_time, dtype=dtype)
+		else:
+			batch.append(index)
+			batch_size += size
+	if batch:
+		yield from pack(specs, batch, dtype)
+
+
+def render_batch(specs: list, batch_points: int = 1 << 20, dtype=np.float64) -> list:
+	"""
+	Renders many viewports, returns their grids in the order of specs.
+	"""
+
+	return [grid for index, grid in iter_batch(specs, True, batch_points, dtype)]
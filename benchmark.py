@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+import time
+import sys
+import os
+import platform
+import subprocess
+import numpy as np
+import numba
+from mandelbrot_slow import Mandelbrot_slow
+from mandelbrot_fast import Mandelbrot_fast
+from mandelbrot_compact import Mandelbrot_compact
+from mandelbrot_faster import Mandelbrot_faster
+from old import Mandelbrot_fastest
+from raster import grid_to_rgb
+from tiled import render_tile, make_engine, iteration_count, ENGINES
+from engines import REGISTRY, grid_getter
+
+
+def best_time(func, repeat: int = 3) -> float:
+	"""
+	Runs func repeat times and returns the fastest wall time.
+	"""
+
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def bench_main_bulbs(res: (int, int) = (300, 300), repeat: int = 3):
+	"""
+	Compares every engine with and without the cardioid/bulb check
+	on the default -2..2 view.
+	"""
+
+	engines = [("slow", Mandelbrot_slow),
+			   ("fast", Mandelbrot_fast),
+			   ("faster", Mandelbrot_faster),
+			   ("fastest", Mandelbrot_fastest)]
+
+	print("{:<10}{:>12}{:>12}{:>10}".format("engine", "plain (s)", "bulbs (s)", "speedup"))
+	for name, engine in engines:
+		times = []
+		for skip_bulbs in (False, True):
+			# Warm-up run so numba compile time isn't measured
+			engine(-2., 2., -2., 2., (8, 8), 1000, skip_bulbs).construct_mandel()
+			run = lambda: engine(-2., 2., -2., 2., res, 1000, skip_bulbs).construct_mandel()
+			times.append(best_time(run, repeat))
+		print("{:<10}{:>12.3f}{:>12.3f}{:>9.1f}x".format(name, times[0], times[1], times[0]/times[1]))
+
+
+def bench_periodicity(res: (int, int) = (300, 300), repeat: int = 3):
+	"""
+	Compares the scalar engines with and without periodicity checking
+	on a view inside the period-3 bulb, where every point is interior.
+	"""
+
+	view = (-0.15, -0.10, 0.72, 0.77)
+	engines = [("slow", Mandelbrot_slow, (res[0]//4, res[1]//4)),
+			   ("faster", Mandelbrot_faster, res)]
+
+	print("{:<10}{:>12}{:>12}{:>10}{:>10}".format("engine", "plain (s)", "cycles (s)", "speedup", "exits"))
+	for name, engine, engine_res in engines:
+		times = []
+		for periodicity in (False, True):
+			engine(*view, (8, 8), 1000, True, periodicity).construct_mandel()
+			run = lambda: engine(*view, engine_res, 1000, True, periodicity).construct_mandel()
+			times.append(best_time(run, repeat))
+		mandel = engine(*view, engine_res, 1000, True, True)
+		mandel.construct_mandel()
+		print("{:<10}{:>12.3f}{:>12.3f}{:>9.1f}x{:>10}".format(name, times[0], times[1],
+			times[0]/times[1], mandel.periodic_exits))
+
+
+def bench_compaction(sizes=((1000, 1000), (4000, 4000)), repeat: int = 1):
+	"""
+	Compares Mandelbrot_fast with the active-set Mandelbrot_compact
+	on the default -2..2 view.
+	"""
+
+	print("{:<12}{:>12}{:>14}{:>10}".format("size", "fast (s)", "compact (s)", "speedup"))
+	for res in sizes:
+		fast = best_time(lambda: Mandelbrot_fast(-2., 2., -2., 2., res).construct_mandel(), repeat)
+		compact = best_time(lambda: Mandelbrot_compact(-2., 2., -2., 2., res).construct_mandel(), repeat)
+		print("{:<12}{:>12.3f}{:>14.3f}{:>9.1f}x".format("{}x{}".format(*res), fast, compact, fast/compact))
+
+
+def bench_coloring(res: (int, int) = (4000, 4000), repeat: int = 3):
+	"""
+	Times the color lookup tables against the old per-pixel
+	hex strings, the strings are timed on a 1000x1000 grid only.
+	"""
+
+	grid = np.random.default_rng(0).integers(0, 1000, res)
+	small = grid[:1000, :1000].flatten()/(np.amax(grid)/1000)
+
+	print("{:<24}{:>12}".format("palette", "time (s)"))
+	hex_time = best_time(lambda: ["#%06x" % (int(x**2.2)) for x in small], 1)
+	print("{:<24}{:>12.3f}".format("hex strings 1000x1000", hex_time))
+	for name, palette in [("power 2.2", {}),
+						  ("power 1.5", {"power": 1.5}),
+						  ("gist_ncar", {"cmap": "gist_ncar", "vmin": 1, "vmax": 1000}),
+						  ("hsv", {"cmap": "hsv", "vmin": 0, "vmax": 30})]:
+		lut_time = best_time(lambda: grid_to_rgb(grid, **palette), repeat)
+		print("{:<24}{:>12.3f}".format("{} {}x{}".format(name, *res), lut_time))
+
+
+def bench_dtype(res: (int, int) = (1000, 1000), repeat: int = 3):
+	"""
+	Compares every engine computing in float64 and float32 on the
+	default -2..2 view, with the share of points that differ.
+	"""
+
+	engines = [("fast", '2'), ("faster", '3'), ("fastest", '4'),
+			   ("compact", '5'), ("parallel", '6'), ("mariani", '7')]
+
+	print("{:<10}{:>14}{:>14}{:>10}{:>10}".format("engine", "float64 (s)", "float32 (s)", "speedup", "differ"))
+	for name, version in engines:
+		times = []
+		grids = []
+		for dtype in (np.float64, np.float32):
+			# Warm-up run so numba compile time isn't measured
+			render_tile(version, -2., 2., -2., 2., (8, 8), 1000, dtype=dtype)
+			times.append(best_time(lambda: render_tile(version, -2., 2., -2., 2., res, 1000, dtype=dtype), repeat))
+			grids.append(render_tile(version, -2., 2., -2., 2., res, 1000, dtype=dtype))
+		differ = np.mean(grids[0] != grids[1])
+		print("{:<10}{:>14.3f}{:>14.3f}{:>9.1f}x{:>9.2%}".format(name, times[0], times[1], times[0]/times[1], differ))
+
+
+# Viewports of the bench matrix, (xmin, xmax, ymin, ymax)
+VIEWPORTS = {
+	"full": (-2.25, 0.75, -1.5, 1.5),
+	"seahorse": (-0.76, -0.74, 0.09, 0.11),
+	# Right of the set, every point escapes after a few iterations
+	"exterior": (0.5, 1.5, -0.5, 0.5),
+}
+
+
+def time_engine(version: str, view: (float, float, float, float),
+				res: (int, int), escape_time: int, dtype=np.float64) -> (float, np.ndarray):
+	"""
+	Runs one engine and returns the wall time and the iteration grid.
+	"""
+
+	start = time.perf_counter()
+	mandel = make_engine(version, *view, res, escape_time, dtype=dtype)
+	# Drawing the progress bar isn't measured
+	mandel.show_progress = False
+	mandel.construct_mandel()
+	elapsed = time.perf_counter() - start
+	return elapsed, grid_getter(version)(mandel)
+
+
+def bench_matrix(versions=('1', '2', '3', '4'), resolutions=((100, 100), (300, 300)),
+				 escape_times=(100, 1000), viewports=tuple(VIEWPORTS),
+				 repeat: int = 5, dtype=np.float64) -> dict:
+	"""
+	Times every engine on every resolution, escape_time and viewport.
+
+
+	The first run of an engine is a tiny warm-up, its time is reported
+	as compile_s since it holds the numba compile time. Every cell is
+	then sampled repeat times. Returns a dict with the environment and
+	one result per cell, ready to be dumped as JSON.
+	"""
+
+	results = []
+	for version in versions:
+		compile_time, grid = time_engine(version, VIEWPORTS["full"], (8, 8), 10, dtype)
+		for res in resolutions:
+			for escape_time in escape_times:
+				for view_name in viewports:
+					view = VIEWPORTS[view_name]
+					samples = []
+					for _ in range(repeat):
+						elapsed, grid = time_engine(version, view, res, escape_time, dtype)
+						samples.append(elapsed)
+					median = float(np.median(samples))
+					pixels = res[0]*res[1]
+					# What a plain escape time loop would run, not what the
+					# engine ran, Mariani-Silver fills most of the points
+					iterations = iteration_count(version, grid, escape_time)
+					results.append({"version": version,
+									"engine": ENGINES[version][0].__name__,
+									"res": list(res),
+									"escape_time": escape_time,
+									"viewport": view_name,
+									"compile_s": compile_time,
+									"samples_s": samples,
+									"median_s": median,
+									"p95_s": float(np.percentile(samples, 95)),
+									"mpixels_per_s": pixels/median/1e6,
+									"equivalent_iterations": iterations,
+									"equivalent_iterations_per_s": iterations/median})
+
+	return {"environment": {"python": platform.python_version(),
+							"numpy": np.__version__,
+							"numba": numba.__version__,
+							"machine": platform.machine(),
+							"cpus": os.cpu_count(),
+							"dtype": np.dtype(dtype).name,
+							"repeat": repeat},
+			"results": results}
+
+
+def format_bench(report: dict) -> str:
+	"""
+	Formats the results of bench_matrix as a table.
+	"""
+
+	lines = ["{:<4}{:<22}{:>11}{:>8}{:>10}{:>11}{:>11}{:>11}{:>10}{:>12}".format(
+		"v", "engine", "size", "iters", "view", "compile s", "median s", "p95 s", "Mpx/s", "Meq-it/s")]
+	for result in report["results"]:
+		lines.append("{:<4}{:<22}{:>11}{:>8}{:>10}{:>11.3f}{:>11.4f}{:>11.4f}{:>10.3f}{:>12.1f}".format(
+			result["version"], result["engine"], "{}x{}".format(*result["res"]),
+			result["escape_time"], result["viewport"], result["compile_s"],
+			result["median_s"], result["p95_s"], result["mpixels_per_s"],
+			result["equivalent_iterations_per_s"]/1e6))
+	return "\n".join(lines)
+
+
+def fresh_time(code: str, repeat: int = 3) -> float:
+	"""
+	Fastest wall time of running code in a new python process, in the
+	directory of the engines so they can be imported.
+	"""
+
+	here = os.path.dirname(os.path.abspath(__file__))
+	return best_time(lambda: subprocess.run([sys.executable, "-c", code], cwd=here, check=True,
+											stdout=subprocess.DEVNULL), repeat)
+
+
+def bench_startup(versions=tuple(REGISTRY), repeat: int = 5) -> dict:
+	"""
+	Import cost of every engine and startup time of the command line
+	interface, each in a fresh process so nothing is imported already.
+
+
+	The bare interpreter is timed too and taken off the rest, an engine
+	is timed from importing the registry to getting its class out of it.
+	"""
+
+	interpreter = fresh_time("pass", repeat)
+	registry = fresh_time("import engines", repeat) - interpreter
+	times = {"interpreter_s": interpreter,
+			 "registry_s": registry,
+			 "cli_help_s": fresh_time("import sys; sys.argv = ['main.py', '--help']\n"
+									  "import cmd_line_interface\n"
+									  "try:\n\tcmd_line_interface.cmd_line_interface()\n"
+									  "except SystemExit:\n\tpass", repeat) - interpreter,
+			 "engines_s": {}}
+	for version in versions:
+		code = "import engines; engines.ENGINES['{}']".format(version)
+		# Engines that import nothing new can come out a bit below zero
+		times["engines_s"][version] = max(0.0, fresh_time(code, repeat) - interpreter - registry)
+	return times
+
+
+def format_startup(times: dict) -> str:
+	"""
+	Formats the results of bench_startup as a table.
+	"""
+
+	lines = ["{:<28}{:>10}".format("startup", "time (s)"),
+			 "{:<28}{:>10.3f}".format("python interpreter", times["interpreter_s"]),
+			 "{:<28}{:>10.3f}".format("engine registry", times["registry_s"]),
+			 "{:<28}{:>10.3f}".format("main.py --help", times["cli_help_s"])]
+	for version, elapsed in times["engines_s"].items():
+		lines.append("{:<28}{:>10.3f}".format("import v{} {}".format(version, REGISTRY[version][1]), elapsed))
+	return "\n".join(lines)
+
+
+if __name__ == "__main__":
+	if len(sys.argv) == 3:
+		res = (int(sys.argv[1]), int(sys.argv[2]))
+	else:
+		res = (300, 300)
+	bench_main_bulbs(res)
+	bench_periodicity(res)
+	bench_compaction()
+	bench_coloring()
+	bench_dtype()
+	print(format_startup(bench_startup()))
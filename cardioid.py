@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+
+def in_main_bulbs(x: float, y: float) -> bool:
+	"""
+	Checks if c=x+yi lies in the main cardioid or the period-2 bulb.
+
+
+	Both regions are inside the mandelbrot set, so those points
+	never escape and don't need to be iterated at all.
+	"""
+
+	q = (x - 0.25)**2 + y**2
+	if q*(q + (x - 0.25)) <= 0.25*y**2:
+		return True
+	return (x + 1)**2 + y**2 <= 0.0625
+
+
+def main_bulbs_mask(x, y):
+	"""
+	Vectorized version of in_main_bulbs for numpy arrays of x and y.
+
+	Returns a boolean array which is True for points in the main
+	cardioid or the period-2 bulb.
+	"""
+
+	q = (x - 0.25)**2 + y**2
+	cardioid = q*(q + (x - 0.25)) <= 0.25*y**2
+	bulb = (x + 1)**2 + y**2 <= 0.0625
+	return cardioid | bulb
@@ -2,10 +2,16 @@
 import time
 import argparse
 import sys
-from mandelbrot_slow import Mandelbrot_slow
-from mandelbrot_fast import Mandelbrot_fast
-from mandelbrot_faster import Mandelbrot_faster
-from old import Mandelbrot_fastest
+import json
+from decimal import Decimal
+from tiled import render_tiled, make_engine, ENGINES, FLOAT64_ONLY, grid_getter
+from precision import DTYPES, check_resolution
+from progressbar import ProgressReporter
+from metrics import RenderMetrics
+from raster import grid_to_rgb, write_png
+from out_of_core import render_memmap, save_memmap_image
+from tile_cache import TileCache
+from escape_time import parse_escape_time
 
 def is_cmd_number(string):
 	if type(string) == str:
@@ -14,6 +20,352 @@ def is_cmd_number(string):
 	return string.replace('.','',1).isdigit()
 
 
+def parse_size(string):
+	"""
+	Reads a resolution written as "300" or "400x300".
+	"""
+
+	if "x" in string:
+		nx, ny = string.split("x")
+		return (int(nx), int(ny))
+	return (int(string), int(string))
+
+
+def bench_interface(argv):
+	"""
+	The bench subcommand, times a matrix of engines, sizes,
+	escape times and viewports.
+	"""
+
+	# Imported here, the benchmarks import every engine
+	from benchmark import bench_matrix, format_bench, VIEWPORTS, bench_startup, format_startup
+
+	parser = argparse.ArgumentParser(prog="main.py bench")
+	parser.add_argument("--versions",
+						help="comma separated engine versions",
+						type = str,
+						default = "1,2,3,4")
+
+	parser.add_argument("--sizes",
+						help="comma separated resolutions, like 300 or 400x300",
+						type = str,
+						default = "100,300")
+
+	parser.add_argument("--escape-times",
+						help="comma separated escape times",
+						type = str,
+						default = "100,1000")
+
+	parser.add_argument("--viewports",
+						help="comma separated viewports out of {}".format(", ".join(VIEWPORTS)),
+						type = str,
+						default = ",".join(VIEWPORTS))
+
+	parser.add_argument("--repeat",
+						help="timed samples per cell",
+						type = int,
+						default = 5)
+
+	parser.add_argument("--dtype",
+						help="float type to compute the points in",
+						choices = list(DTYPES),
+						default = "float64")
+
+	parser.add_argument("--json",
+						help="also write the results to this JSON file",
+						type = str,
+						default = None)
+
+	parser.add_argument("--startup",
+						help="time the import of every engine and the startup of main.py instead",
+						action = "store_true")
+
+	args = parser.parse_args(argv)
+	versions = args.versions.split(",")
+	for version in versions:
+		if version not in ENGINES:
+			parser.error("unknown version {}".format(version))
+	viewports = args.viewports.split(",")
+	for viewport in viewports:
+		if viewport not in VIEWPORTS:
+			parser.error("unknown viewport {}".format(viewport))
+
+	if args.startup:
+		report = bench_startup(versions, args.repeat)
+		print(format_startup(report))
+	else:
+		report = bench_matrix(versions, [parse_size(size) for size in args.sizes.split(",")],
+							  [int(n) for n in args.escape_times.split(",")], viewports,
+							  args.repeat, DTYPES[args.dtype])
+		print(format_bench(report))
+	if args.json is not None:
+		with open(args.json, "w") as f:
+			json.dump(report, f, indent=2)
+		print("\nResults saved as: {}".format(args.json))
+
+
+def animate_interface(argv):
+	"""
+	The animate subcommand, renders a zoom to a point as numbered PNGs.
+	"""
+
+	from animate import render_animation
+
+	parser = argparse.ArgumentParser(prog="main.py animate")
+	parser.add_argument("cx", help="real part of the point to zoom to", type = float)
+	parser.add_argument("cy", help="imaginary part of the point to zoom to", type = float)
+	parser.add_argument("start_scale", help="width of the first frame", type = float)
+	parser.add_argument("end_scale", help="width of the last frame", type = float)
+	parser.add_argument("frames", help="number of frames", type = int)
+	parser.add_argument("Nx", help="pixels along x", type = int)
+	parser.add_argument("Ny", help="pixels along y", type = int)
+	parser.add_argument("prefix", help="frames are saved as prefix_00000.png and so on", type = str)
+
+	parser.add_argument("--escape-time",
+						help="max iterations per point",
+						type = int,
+						default = 1000)
+
+	parser.add_argument("--no-reuse",
+						help="compute every frame from scratch",
+						action = "store_true")
+
+	parser.add_argument("--seed-exterior",
+						help="also seed escaped regions from the previous frame, faster but may miss thin filaments",
+						action = "store_true")
+
+	parser.add_argument("--dtype",
+						help="float type to compute the points in",
+						choices = list(DTYPES),
+						default = "float64")
+
+	args = parser.parse_args(argv)
+	if args.frames < 1:
+		parser.error("frames has to be at least 1")
+
+	stats = render_animation(args.cx, args.cy, args.start_scale, args.end_scale, args.frames,
+							 (args.Nx, args.Ny), args.escape_time, args.prefix + "_{:05d}.png",
+							 reuse = not args.no_reuse, seed_exterior = args.seed_exterior,
+							 dtype = DTYPES[args.dtype], cmap = "gist_ncar", vmin = 1, vmax = args.escape_time)
+	print("{:<8}{:>10}{:>12}  {}".format("frame", "time (s)", "computed", "file"))
+	for frame in stats:
+		print("{:<8}{:>10.3f}{:>12.1%}  {}".format(frame["frame"], frame["time_s"], frame["computed"], frame["file"]))
+	print("\nTotal: {:.3f} s".format(sum(frame["time_s"] for frame in stats)))
+
+
+def warmup_interface(argv):
+	"""
+	The warmup subcommand, compiles every numba kernel into the disk
+	cache so later runs don't compile.
+	"""
+
+	from warmup import warmup, format_warmup
+
+	parser = argparse.ArgumentParser(prog="main.py warmup")
+	parser.add_argument("--dtypes",
+						help="comma separated float types to compile for",
+						type = str,
+						default = ",".join(DTYPES))
+
+	args = parser.parse_args(argv)
+	dtypes = args.dtypes.split(",")
+	for dtype in dtypes:
+		if dtype not in DTYPES:
+			parser.error("unknown dtype {}".format(dtype))
+
+	print(format_warmup(warmup([DTYPES[dtype] for dtype in dtypes])))
+
+
+def serve_interface(argv):
+	"""
+	The serve subcommand, runs the tile server until interrupted.
+	"""
+
+	from tile_server import TileServer
+
+	parser = argparse.ArgumentParser(prog="main.py serve")
+	parser.add_argument("--host",
+						help="address to listen on",
+						type = str,
+						default = "127.0.0.1")
+
+	parser.add_argument("--port",
+						help="port to listen on",
+						type = int,
+						default = 8000)
+
+	parser.add_argument("--version",
+						help="engine to render the tiles with",
+						type = str,
+						default = "6")
+
+	parser.add_argument("--workers",
+						help="render processes, defaults to the number of cores",
+						type = int,
+						default = None)
+
+	parser.add_argument("--cache-size",
+						help="size limit of the in-memory PNG cache in MB",
+						type = int,
+						default = 64)
+
+	parser.add_argument("--tile-size",
+						help="pixels along each side of a tile",
+						type = int,
+						default = 256)
+
+	parser.add_argument("--escape-time",
+						help="max iterations per point, or auto to pick it per zoom",
+						type = str,
+						default = "auto")
+
+	args = parser.parse_args(argv)
+	if args.version not in ENGINES or args.version == "8":
+		parser.error("version {} can't render tiles".format(args.version))
+	if args.escape_time != "auto" and not args.escape_time.isdigit():
+		parser.error("--escape-time has to be a number or auto")
+
+	tiles = TileServer(args.version, args.workers, args.cache_size*1024*1024, args.tile_size,
+					   None if args.escape_time == "auto" else int(args.escape_time))
+	server = tiles.make_server(args.host, args.port)
+	print("Serving tiles at http://{}:{}/z/x/y.png, counters at /metrics".format(args.host, args.port))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		tiles.close()
+
+
+def parse_address(string):
+	"""
+	Reads an address written as "host:port".
+	"""
+
+	host, port = string.rsplit(":", 1)
+	return (host, int(port))
+
+
+def coordinate_interface(argv):
+	"""
+	The coordinate subcommand, hands the tiles of a render out to
+	workers over TCP and saves the assembled image.
+	"""
+
+	import multiprocessing
+	from distributed import Coordinator, run_worker
+
+	parser = argparse.ArgumentParser(prog="main.py coordinate")
+	parser.add_argument("version", help="engine the workers render with", type = str)
+	parser.add_argument("xmin", help="starting value of the x-axis", type = float)
+	parser.add_argument("xmax", help="ending value of the x-axis", type = float)
+	parser.add_argument("ymin", help="starting value of the y-axis", type = float)
+	parser.add_argument("ymax", help="ending value of the y-axis", type = float)
+	parser.add_argument("Nx", help="pixels along x", type = int)
+	parser.add_argument("Ny", help="pixels along y", type = int)
+	parser.add_argument("name", help="the image is saved as name.png", type = str)
+
+	parser.add_argument("--listen",
+						help="host:port the workers connect to",
+						type = str,
+						default = "127.0.0.1:5000")
+
+	parser.add_argument("--authkey",
+						help="shared secret of the coordinator and the workers, a random one is made and printed if not given",
+						type = str,
+						default = None)
+
+	parser.add_argument("--tile-size",
+						help="tile size, like 256 or 512x256",
+						type = str,
+						default = "256")
+
+	parser.add_argument("--escape-time",
+						help="max iterations per point, or auto to pick one from the zoom depth",
+						type = str,
+						default = "1000")
+
+	parser.add_argument("--dtype",
+						help="float type to compute the points in",
+						choices = list(DTYPES),
+						default = "float64")
+
+	parser.add_argument("--lease",
+						help="seconds without a heartbeat before a worker's tiles are handed out again",
+						type = float,
+						default = 30.0)
+
+	parser.add_argument("--local-workers",
+						help="also start this many workers on this machine",
+						type = int,
+						default = 0)
+
+	args = parser.parse_args(argv)
+	if args.version not in ENGINES or args.version == "8":
+		parser.error("version {} can't render distributed".format(args.version))
+	if args.dtype != "float64" and args.version in FLOAT64_ONLY:
+		parser.error("version {} only computes in float64".format(args.version))
+	if args.escape_time != "auto" and not args.escape_time.isdigit():
+		parser.error("--escape-time has to be a number or auto")
+	escape_time = parse_escape_time(args.escape_time, args.xmin, args.xmax, args.ymin, args.ymax)
+
+	start_time = time.time()
+	coordinator = Coordinator(args.version, args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny),
+							  escape_time, parse_size(args.tile_size), DTYPES[args.dtype],
+							  parse_address(args.listen), None if args.authkey is None else args.authkey.encode(),
+							  args.lease)
+	address = coordinator.start()
+	print("Waiting for workers at {}:{}, escape time: {}".format(*address, escape_time))
+	if args.authkey is None:
+		print("Start workers with: main.py worker {}:{} --authkey {}".format(*address, coordinator.authkey.decode()))
+	context = multiprocessing.get_context("spawn")
+	workers = [context.Process(target=run_worker, args=(address, coordinator.authkey))
+			   for _ in range(args.local_workers)]
+	try:
+		for worker in workers:
+			worker.start()
+		grid = coordinator.wait(ProgressReporter(args.Nx*args.Ny, 60))
+		status = coordinator.queue.status()
+	finally:
+		coordinator.close()
+		for worker in workers:
+			worker.join()
+	write_png(grid_to_rgb(grid), args.name+".png")
+
+	print("Tiles per worker: {}".format(", ".join("{} {}".format(name, tiles)
+												 for name, tiles in status["by_worker"].items())))
+	print("Requeued: {requeued}, failed: {failed}, sent: {bytes} bytes compressed".format(**status))
+	print("Process complete! Time used: {}".format(time.time()-start_time))
+
+
+def worker_interface(argv):
+	"""
+	The worker subcommand, renders tiles for a coordinator until its
+	render is done.
+	"""
+
+	from multiprocessing import AuthenticationError
+	from distributed import run_worker
+
+	parser = argparse.ArgumentParser(prog="main.py worker")
+	parser.add_argument("address", help="host:port of the coordinator", type = str)
+
+	parser.add_argument("--authkey",
+						help="shared secret of the coordinator and the workers, printed by the coordinator",
+						type = str,
+						required = True)
+
+	args = parser.parse_args(argv)
+	try:
+		tiles = run_worker(parse_address(args.address), args.authkey.encode())
+	except ConnectionRefusedError:
+		parser.exit(1, "No coordinator at {}\n".format(args.address))
+	except AuthenticationError:
+		parser.exit(1, "The coordinator at {} has another authkey\n".format(args.address))
+	print("Rendered {} tiles".format(tiles))
+
+
 def cmd_line_interface():
 	"""
 	A comprehensive commnad line interface for selecting a mandelbrot.
@@ -23,6 +375,25 @@ def cmd_line_interface():
 	or take command line arguments as input with the argparse module.
 	"""
 
+	if len(sys.argv) > 1 and sys.argv[1] == "bench":
+		bench_interface(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == "animate":
+		animate_interface(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == "warmup":
+		warmup_interface(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == "serve":
+		serve_interface(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == "coordinate":
+		coordinate_interface(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == "worker":
+		worker_interface(sys.argv[2:])
+		return
+
 	if len(sys.argv) == 1:
 		args = {}
 		# Introduction
@@ -41,11 +412,11 @@ def cmd_line_interface():
 
 		# Selecting version
 		msg = """
-	Select a version to use, current options are 1, 2, and 3.
+	Select a version to use, current options are 1, 2, 3, 4, 5, 6, 7 and 8.
 	"""
 		version = input(msg)
 
-		while(not version in ['1','2','3','4']):
+		while(not version in ['1','2','3','4','5','6','7','8']):
 			print("	Invalid input!")
 			version = input(msg)
 		args["version"] = version
@@ -173,19 +544,19 @@ def cmd_line_interface():
 
 		parser.add_argument("xmin",
 							help="startpoint of x",
-							type = float)
+							type = str)
 
 		parser.add_argument("xmax",
 							help="endpoint of x",
-							type = float)
+							type = str)
 
 		parser.add_argument("ymin",
 							help="startpoint of y",
-							type = float)
+							type = str)
 
 		parser.add_argument("ymax",
 							help="endpoint of y",
-							type = float)
+							type = str)
 
 		parser.add_argument("Nx",
 							help="points computed in x-direction",
@@ -199,8 +570,63 @@ def cmd_line_interface():
 							help="set name of image",
 							type = str)
 
+		parser.add_argument("--workers",
+							help="render in tiles on this many processes",
+							type = int,
+							default = 1)
+
+		parser.add_argument("--memmap",
+							help="render in row bands into this .npy file instead of memory",
+							type = str,
+							default = None)
+
+		parser.add_argument("--cache",
+							help="directory to cache rendered tiles in",
+							type = str,
+							default = None)
+
+		parser.add_argument("--cache-size",
+							help="size limit of the tile cache in MB",
+							type = int,
+							default = 1024)
+
+		parser.add_argument("--dtype",
+							help="float type to compute the points in",
+							choices = list(DTYPES),
+							default = "float64")
+
+		parser.add_argument("--metrics",
+							help="write phase timings and iteration statistics to this JSON file",
+							type = str,
+							default = None)
+
+		parser.add_argument("--escape-time",
+							help="max iterations per point, or auto to pick it from the zoom depth",
+							type = str,
+							default = "1000")
+
+		parser.add_argument("--probe",
+							help="with --escape-time auto, raise it until a low resolution probe stops changing (not for version 8)",
+							action = "store_true")
+
 		args = parser.parse_args()
 
+		# The bounds are kept as text for the deep zoom engine,
+		# a float can't hold more than about 16 digits
+		for bound in ("xmin", "xmax", "ymin", "ymax"):
+			value = getattr(args, bound)
+			setattr(args, bound, Decimal(value) if args.version == '8' else float(value))
+
+		if args.dtype != "float64" and args.version in FLOAT64_ONLY:
+			parser.error("version {} only computes in float64".format(args.version))
+
+		if args.escape_time != "auto" and not args.escape_time.isdigit():
+			parser.error("--escape-time has to be a number or auto")
+		# The probe computes in float64, too coarse for the deep zoom engine
+		args.escape_time = parse_escape_time(args.escape_time, args.xmin, args.xmax, args.ymin, args.ymax,
+											 args.probe and args.version != '8')
+		print("Escape time: {}".format(args.escape_time))
+
 		# Constructs the filename
 
 
@@ -208,16 +634,53 @@ def cmd_line_interface():
 	# Runs the mandelbrot
 	start_time = time.time()
 	mandel = None
-	if args.version == '1':
-		mandel = Mandelbrot_slow(args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny))
-	elif args.version == '2':
-		mandel = Mandelbrot_fast(args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny))
-	elif args.version == '3':
-		mandel = Mandelbrot_faster(args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny))
-	elif args.version == '4':
-		mandel = Mandelbrot_fastest(args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny))
-	mandel.construct_mandel()
-	#mandel.save_fig(args.name+".png")
+	cache = None
+	dtype = DTYPES[args.dtype]
+	metrics = RenderMetrics(args.version, (args.Nx, args.Ny), args.escape_time)
+	if args.cache is not None:
+		cache = TileCache(args.cache, args.cache_size*1024*1024)
+
+	if args.memmap is not None:
+		with metrics.phase("iteration"):
+			render_memmap(args.memmap, args.version, args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny),
+						  args.escape_time, cache=cache, float_dtype=dtype, progress=ProgressReporter(args.Nx*args.Ny, 60))
+	elif args.workers > 1 or cache is not None:
+		with metrics.phase("iteration"):
+			grid = render_tiled(args.version, args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny),
+								args.escape_time, workers=args.workers, cache=cache, dtype=dtype,
+								progress=ProgressReporter(args.Nx*args.Ny, 60))
+	else:
+		if args.version not in FLOAT64_ONLY:
+			check_resolution(args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny), dtype)
+		with metrics.phase("grid_build"):
+			mandel = make_engine(args.version, args.xmin, args.xmax, args.ymin, args.ymax, (args.Nx, args.Ny),
+								 args.escape_time, dtype=dtype)
+	if mandel is not None:
+		with metrics.phase("iteration"):
+			mandel.construct_mandel()
+		grid = grid_getter(args.version)(mandel)
+	if args.memmap is not None:
+		# Colored band by band while saving
+		with metrics.phase("save"):
+			save_memmap_image(args.memmap, args.name+".png")
+	else:
+		with metrics.phase("coloring"):
+			rgb = grid_to_rgb(grid)
+		with metrics.phase("save"):
+			write_png(rgb, args.name+".png")
 
 	end_time = time.time()
-	print("Process complete! Time used: {}".format(end_time-start_time))
\ No newline at end of file
+	if cache is not None:
+		print("Tile cache: {hits} hits, {misses} misses, {evictions} evictions".format(**cache.stats()))
+	print("Process complete! Time used: {}".format(end_time-start_time))
+	# Numba compiles are timed apart, they're gone once the kernels are cached
+	compile_time = metrics.phases["jit_compile"]
+	print("Compile time: {:.3f} s, render time: {:.3f} s".format(compile_time, end_time-start_time-compile_time))
+
+	if args.metrics is not None:
+		# The grid of a memmap render isn't loaded, so it only has the timings
+		if args.memmap is None:
+			metrics.add_grid(grid, args.xmin, args.xmax, args.ymin, args.ymax, mandel=mandel)
+		metrics.finish()
+		metrics.save(args.metrics)
+		print("Metrics saved as: {}".format(args.metrics))
\ No newline at end of file
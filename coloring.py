@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+from functools import lru_cache
+import numpy as np
+
+
+@lru_cache(maxsize=64)
+def color_table(top: int, power: float = 2.2, digits: int = 6,
+				cmap: str = None, vmin: float = None, vmax: float = None) -> np.ndarray:
+	"""
+	Precomputes the color of every iteration count from 0 to top,
+	as a (top+1, 3) uint8 array, or (top+1, 4) for RGBA.
+
+
+	By default the counts are normalized to 0-1000 and x**power is used
+	as a "#rrggbb" hex value, with digits=8 it's read as "#rrggbbaa".
+	With cmap set the matplotlib colormap of that name is used between
+	vmin and vmax instead.
+	"""
+
+	counts = np.arange(top + 1, dtype=np.float64)
+
+	if cmap is not None:
+		import matplotlib
+		import matplotlib.colors
+		norm = matplotlib.colors.Normalize(vmin=vmin, vmax=vmax)
+		table = matplotlib.colormaps[cmap](norm(counts), bytes=True)[:, :3]
+	else:
+		# Normalizes the counts like the old save_fig did with the grid
+		if top > 0:
+			counts = counts/(top/1000)
+		packed = (counts**power).astype(np.int64)
+		if digits == 8:
+			table = np.stack([np.zeros_like(packed), packed >> 16, packed >> 8, packed], axis=-1)
+		else:
+			table = np.stack([packed >> 16, packed >> 8, packed], axis=-1)
+		table = (table & 0xff).astype(np.uint8)
+
+	table.setflags(write=False)
+	return table
+
+
+def apply_table(counts: np.ndarray, table: np.ndarray) -> np.ndarray:
+	"""
+	Looks up the color of every count with one numpy take.
+	"""
+
+	return np.take(table, counts, axis=0)
+
+
+def color_counts(counts: np.ndarray, **palette) -> np.ndarray:
+	"""
+	Colors an array of iteration counts with the table for the
+	given palette, see color_table for the options.
+	"""
+
+	counts = np.asarray(counts)
+	if not np.issubdtype(counts.dtype, np.integer):
+		counts = counts.astype(np.intp)
+	top = int(np.amax(counts)) if counts.size > 0 else 0
+	bottom = int(np.amin(counts)) if counts.size > 0 else 0
+	return apply_table(counts, palette_table(top, bottom, **palette))
+
+
+def palette_table(top: int, bottom: int = 0, **palette) -> np.ndarray:
+	"""
+	Gets the color table for counts between bottom and top.
+
+	Colormaps scale between the smallest and biggest count
+	unless vmin and vmax are given.
+	"""
+
+	if palette.get("cmap") is not None:
+		if palette.get("vmin") is None:
+			palette["vmin"] = bottom
+		if palette.get("vmax") is None:
+			palette["vmax"] = top
+	return color_table(top, **palette)
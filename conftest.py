@@ -0,0 +1,2 @@
+# test_mandelbrot.py is a script that runs (and exits) on import
+collect_ignore = ["test_mandelbrot.py"]
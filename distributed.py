@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+import io
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+from multiprocessing.managers import BaseManager
+import numpy as np
+from tiled import render_tile, split_tiles, iteration_count
+from precision import check_resolution
+from engines import FLOAT64_ONLY
+from progressbar import ProgressReporter
+
+
+def pack_tile(tile: np.ndarray) -> bytes:
+	"""
+	Compresses a tile for sending, dtype and shape included.
+	"""
+
+	buffer = io.BytesIO()
+	np.save(buffer, tile, allow_pickle=False)
+	return zlib.compress(buffer.getvalue())
+
+
+def unpack_tile(payload: bytes) -> np.ndarray:
+	return np.load(io.BytesIO(zlib.decompress(payload)), allow_pickle=False)
+
+
+class WorkQueue():
+	def __init__(self, spec: dict, windows: list, lease_s: float = 30.0, max_attempts: int = 3):
+		"""
+		Tiles of one render, handed out to workers through the manager.
+
+
+		A worker takes a tile on a lease of lease_s seconds, which its
+		heartbeat keeps extending while it renders. Tiles of workers that
+		report a failure or whose lease runs out, like a killed worker's,
+		are put back in the queue. A tile failing max_attempts times
+		fails the render. Every method runs on a thread of the manager
+		server, so everything is behind a lock.
+		"""
+
+		self.render_spec = spec
+		self.windows = windows
+		self.lease_s = lease_s
+		self.max_attempts = max_attempts
+		self.pending = deque(range(len(windows)))
+		# Tile index to (worker, lease deadline)
+		self.leases = {}
+		self.attempts = [0]*len(windows)
+		# Compressed tiles by index, taken by the coordinator with collect
+		self.results = {}
+		self.finished = set()
+		self.errors = []
+		self.tiles_by_worker = {}
+		self.counts = {"requeued": 0, "failed": 0, "duplicates": 0, "bytes": 0}
+		self.lock = threading.Lock()
+
+
+	def spec(self) -> dict:
+		return self.render_spec
+
+
+	def expire(self):
+		now = time.monotonic()
+		for index, (worker, deadline) in list(self.leases.items()):
+			if deadline < now:
+				del self.leases[index]
+				self.pending.append(index)
+				self.counts["requeued"] += 1
+
+
+	def take(self, worker: str) -> (int, tuple):
+		"""
+		Leases the next tile to worker as (index, window). index is None
+		when every tile left is leased to someone, and the whole result
+		None once the render is done or failed.
+		"""
+
+		with self.lock:
+			self.expire()
+			if self.errors or len(self.finished) == len(self.windows):
+				return None
+			if not self.pending:
+				return (None, None)
+			index = self.pending.popleft()
+			self.attempts[index] += 1
+			self.leases[index] = (worker, time.monotonic() + self.lease_s)
+			return (index, self.windows[index])
+
+
+	def heartbeat(self, worker: str):
+		"""
+		Extends the leases of worker, it's still alive.
+		"""
+
+		with self.lock:
+			deadline = time.monotonic() + self.lease_s
+			for index, (owner, _) in self.leases.items():
+				if owner == worker:
+					self.leases[index] = (owner, deadline)
+
+
+	def put(self, worker: str, index: int, payload: bytes):
+		"""
+		Stores a rendered tile, a copy from a worker that lost its lease
+		is dropped, it's identical anyway.
+		"""
+
+		with self.lock:
+			if self.leases.get(index, (None,))[0] == worker:
+				del self.leases[index]
+			if index in self.finished:
+				self.counts["duplicates"] += 1
+				return
+			if index in self.pending:
+				self.pending.remove(index)
+			self.finished.add(index)
+			self.results[index] = payload
+			self.counts["bytes"] += len(payload)
+			self.tiles_by_worker[worker] = self.tiles_by_worker.get(worker, 0) + 1
+
+
+	def fail(self, worker: str, index: int, error: str):
+		"""
+		Puts a tile back after its render raised error in worker.
+		"""
+
+		with self.lock:
+			if self.leases.get(index, (None,))[0] != worker:
+				return
+			del self.leases[index]
+			self.counts["failed"] += 1
+			if self.attempts[index] >= self.max_attempts:
+				self.errors.append("tile {} failed {} times, last on {}: {}".format(
+					index, self.attempts[index], worker, error))
+			else:
+				self.pending.append(index)
+
+
+	def collect(self) -> dict:
+		"""
+		Takes the tiles finished since the last call, by index.
+		"""
+
+		with self.lock:
+			self.expire()
+			results = self.results
+			self.results = {}
+			return results
+
+
+	def status(self) -> dict:
+		with self.lock:
+			return {"tiles": len(self.windows),
+					"finished": len(self.finished),
+					"pending": len(self.pending),
+					"leased": len(self.leases),
+					"errors": list(self.errors),
+					"by_worker": dict(self.tiles_by_worker),
+					**self.counts}
+
+
+# Queue of the render served by this process, in the manager server
+QUEUE = None
+
+
+def create_queue(*args) -> WorkQueue:
+	global QUEUE
+	QUEUE = WorkQueue(*args)
+	return QUEUE
+
+
+def get_queue() -> WorkQueue:
+	return QUEUE
+
+
+class QueueManager(BaseManager):
+	pass
+
+
+# The coordinator creates the queue, workers only get it
+QueueManager.register("create", callable=create_queue)
+QueueManager.register("work", callable=get_queue)
+
+
+class Coordinator():
+	def __init__(self, version: str, xmin: float, xmax: float,
+				 ymin: float, ymax: float, res: (int, int),
+				 escape_time: int = 1000, tile_size: (int, int) = (128, 128),
+				 dtype=np.float64, address: (str, int) = ("127.0.0.1", 0),
+				 authkey: bytes = None, lease_s: float = 30.0, max_attempts: int = 3):
+		"""
+		Splits a render into tiles and serves them to workers over TCP,
+		see run_worker.
+
+
+		The tiles are rendered with the same windows as render_tiled, so
+		the assembled grid is identical to a local render. The queue
+		lives in a manager server process started by start, port 0
+		picks a free port and start returns the address the workers
+		connect to.
+		The manager unpickles whatever a peer with the authkey sends, so
+		without an authkey a random one is made, see self.authkey.
+		"""
+
+		if version == '8':
+			raise ValueError("version {} needs arbitrary precision bounds, tiles are sent as floats".format(version))
+		if version not in FLOAT64_ONLY:
+			check_resolution(xmin, xmax, ymin, ymax, res, dtype)
+		self.version = version
+		self.res = tuple(res)
+		self.escape_time = escape_time
+		self.spec = {"version": version,
+					 "view": (xmin, xmax, ymin, ymax),
+					 "res": self.res,
+					 "escape_time": escape_time,
+					 "dtype": np.dtype(dtype).name,
+					 "lease_s": lease_s}
+		self.windows = split_tiles(res, tile_size)
+		self.lease_s = lease_s
+		self.max_attempts = max_attempts
+		if authkey is None:
+			authkey = secrets.token_hex(16).encode()
+		self.authkey = authkey
+		# Spawned, a fork after numba ran its threads in this process can
+		# hang the server
+		self.manager = QueueManager(address=address, authkey=authkey,
+									ctx=multiprocessing.get_context("spawn"))
+		self.queue = None
+
+
+	def start(self) -> (str, int):
+		self.manager.start()
+		self.queue = self.manager.create(self.spec, self.windows, self.lease_s, self.max_attempts)
+		return self.manager.address
+
+
+	def wait(self, progress: ProgressReporter = None, poll_s: float = 0.05) -> np.ndarray:
+		"""
+		Assembles the tiles as workers send them, returns the (Nx, Ny)
+		grid once every tile is in.
+		"""
+
+		grid = np.zeros(self.res)
+		done = 0
+		while done < len(self.windows):
+			results = self.queue.collect()
+			for index, payload in results.items():
+				window = self.windows[index]
+				tile = unpack_tile(payload)
+				grid[window[0]:window[1], window[2]:window[3]] = tile
+				if progress is not None:
+					progress.update(tile.size, iteration_count(self.version, tile, self.escape_time))
+			done += len(results)
+			if not results:
+				errors = self.queue.status()["errors"]
+				if errors:
+					raise RuntimeError("; ".join(errors))
+				time.sleep(poll_s)
+		if progress is not None:
+			progress.close()
+		return grid
+
+
+	def close(self):
+		# Workers see the connection drop and stop
+		self.manager.shutdown()
+
+
+def run_worker(address: (str, int), authkey: bytes, name: str = None,
+			   poll_s: float = 0.2) -> int:
+	"""
+	Renders tiles for the coordinator at address until its render is
+	done, returns the number of tiles rendered here.
+
+
+	A heartbeat thread keeps the leases of this worker alive while a
+	tile renders, so slow tiles aren't handed to someone else. Stops
+	quietly if the coordinator goes away.
+	"""
+
+	manager = QueueManager(address=tuple(address), authkey=authkey)
+	manager.connect()
+	work = manager.work()
+	if name is None:
+		name = "{}:{}".format(socket.gethostname(), os.getpid())
+	spec = work.spec()
+	dtype = np.dtype(spec["dtype"]).type
+
+	stop = threading.Event()
+	def heartbeat():
+		# Proxies connect once per thread, so this has its own connection
+		while not stop.wait(spec["lease_s"]/3):
+			try:
+				work.heartbeat(name)
+			except (EOFError, OSError):
+				return
+	threading.Thread(target=heartbeat, daemon=True).start()
+
+	rendered = 0
+	try:
+		while True:
+			job = work.take(name)
+			if job is None:
+				break
+			index, window = job
+			if index is None:
+				time.sleep(poll_s)
+				continue
+			try:
+				tile = render_tile(spec["version"], *spec["view"], spec["res"], spec["escape_time"],
+								   window, dtype=dtype)
+			except Exception as error:
+				work.fail(name, index, repr(error))
+				continue
+			work.put(name, index, pack_tile(tile))
+			rendered += 1
+	except (EOFError, OSError):
+		# The coordinator is gone, the render is done or given up
+		pass
+	finally:
+		stop.set()
+	return rendered
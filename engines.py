@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import importlib
+from collections.abc import Mapping
+import numpy as np
+
+
+def grid_from_mandels_grid(mandel) -> np.ndarray:
+	return mandel.mandels_grid
+
+
+def grid_from_clr_values(mandel) -> np.ndarray:
+	# clr_values is flattened row by row along y
+	nx = mandel.window[1] - mandel.window[0]
+	ny = mandel.window[3] - mandel.window[2]
+	return np.real(mandel.clr_values).reshape((ny, nx)).T
+
+
+# Module and class of every engine version, and how to get an (Nx, Ny)
+# iteration grid out of it
+REGISTRY = {
+	'1': ("mandelbrot_slow", "Mandelbrot_slow", grid_from_mandels_grid),
+	'2': ("mandelbrot_fast", "Mandelbrot_fast", grid_from_clr_values),
+	'3': ("mandelbrot_faster", "Mandelbrot_faster", grid_from_mandels_grid),
+	'4': ("old", "Mandelbrot_fastest", grid_from_clr_values),
+	'5': ("mandelbrot_compact", "Mandelbrot_compact", grid_from_clr_values),
+	'6': ("mandelbrot_parallel", "Mandelbrot_parallel", grid_from_mandels_grid),
+	'7': ("mariani_silver", "Mandelbrot_mariani", grid_from_mandels_grid),
+	'8': ("mandelbrot_deep", "Mandelbrot_deep", grid_from_mandels_grid),
+}
+
+# Engines with a separate class for float32
+FLOAT32_REGISTRY = {
+	'3': ("mandelbrot_faster", "Mandelbrot_faster32"),
+	'4': ("old", "Mandelbrot_fastest32"),
+}
+
+# Engines that only compute in float64, or in arbitrary precision
+FLOAT64_ONLY = ('1', '8')
+
+
+class LazyEngines(Mapping):
+	"""
+	Engines of a registry by version, the module of an engine is only
+	imported the first time it's looked up.
+
+
+	Importing every engine pulls in numba and sets up the compiled
+	functions, which took most of the startup time of a version 1 run
+	or --help.
+	Looking up a version gives the class, followed by the rest of its
+	registry entry if there is any. Checking for or listing versions
+	imports nothing.
+	"""
+
+	def __init__(self, registry: dict):
+		self.registry = registry
+		self.loaded = {}
+
+
+	def __getitem__(self, version: str):
+		if version not in self.loaded:
+			module, name, *rest = self.registry[version]
+			engine = getattr(importlib.import_module(module), name)
+			self.loaded[version] = (engine, *rest) if rest else engine
+		return self.loaded[version]
+
+
+	def __iter__(self):
+		return iter(self.registry)
+
+
+	def __len__(self) -> int:
+		return len(self.registry)
+
+
+# Engine and grid getter per version, like (Mandelbrot_slow, grid_from_mandels_grid)
+ENGINES = LazyEngines(REGISTRY)
+FLOAT32_ENGINES = LazyEngines(FLOAT32_REGISTRY)
+
+
+def grid_getter(version: str):
+	"""
+	How to get the iteration grid out of an engine, without importing it.
+	"""
+
+	return REGISTRY[version][2]
+
+
+def counts_up(version: str) -> bool:
+	"""
+	True if the engine counts up to escape_time-1 for the interior,
+	False if it counts down to 0.
+	"""
+
+	return grid_getter(version) is grid_from_clr_values
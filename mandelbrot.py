@@ -1,17 +1,20 @@
 #!/usr/bin/env python3
 
-import matplotlib.pyplot as plt
 import numpy as np
 import sys
 import time
-from progressbar import progressbar
+from progressbar import ProgressReporter
+from cardioid import in_main_bulbs
+from raster import save_image
 
 
 
 class Mandelbrot():
 	def __init__(self, xmin: float, xmax: float,
 				ymin: float, ymax: float,
-				res: (int, int), escape_time: int = 1000):
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, periodicity: bool = False,
+				period_tol: float = 1e-10):
 
 		self.xmin = xmin
 		self.xmax = xmax
@@ -19,6 +22,11 @@ class Mandelbrot():
 		self.ymax = ymax
 		self.res = res
 		self.escape_time = escape_time
+		self.skip_bulbs = skip_bulbs
+		self.periodicity = periodicity
+		self.period_tol = period_tol
+		# Number of points found to be periodic before escape_time
+		self.periodic_exits = 0
 		self.mandels_grid = np.zeros(res)
 		self.array_x = np.zeros(self.res[0]*self.res[1])
 		self.array_y = np.zeros(self.res[0]*self.res[1])
@@ -37,13 +45,33 @@ class Mandelbrot():
 
 
 	def mandelbrot_value(self, c: complex) -> int:
+		# The main cardioid and period-2 bulb never escape
+		if self.skip_bulbs and in_main_bulbs(c.real, c.imag):
+			return 0
+
 		val = self.escape_time
 		f = complex(0,0)
+		# Saved orbit point and step counters for periodicity checking
+		saved = complex(0,0)
+		steps = 0
+		step_limit = 2
 		while val > 0:
 			f = self.mandelbrot_calculation(f,c)
 			if abs(f) > 2:
 				return val
 			val = val -1
+			if self.periodicity:
+				# Orbit came back to the saved point, so it is periodic
+				# and will never escape
+				if abs(f - saved) < self.period_tol:
+					self.periodic_exits += 1
+					return 0
+				# Brent's method, move the saved point at every power of two
+				steps += 1
+				if steps == step_limit:
+					saved = f
+					steps = 0
+					step_limit *= 2
 
 		return val
 		
@@ -59,6 +87,9 @@ class Mandelbrot():
 		
 		prog = 0
 		prog_done = cx_range.size*cy_range.size
+		# Updated once per row, printing for every pixel took a big
+		# part of the runtime
+		progress = ProgressReporter(prog_done, 60)
 
 		for xIndex, xValue in enumerate(cx_range):
 			for yIndex, yValue in enumerate(cy_range):
@@ -66,25 +97,17 @@ class Mandelbrot():
 				self.array_x[prog] = xValue
 				self.array_y[prog] = yValue
 				prog+=1
-				progressbar(prog, prog_done, 60)
+			row = self.mandels_grid[xIndex]
+			progress.update(cy_range.size, int(np.where(row == 0, self.escape_time, self.escape_time - row + 1).sum()))
+		progress.close()
 
 
 	def save_fig(self, filename):
 		"""
-		Saves a mandelbrot scatter-plot as an image-file.
+		Saves the mandelbrot as a png image, one pixel per point.
 		"""
-		
-		clr_values = self.mandels_grid.flatten()
-		
-		# Normalizes the values of the color array
-		clr_values = clr_values/(np.amax(clr_values)/1000)
-		# Converts the array into an array of hex color values
-		# The power on x is just to increase the color range
-		clr_arr_hex = ["#%06x" % (int(x**2.2)) for x in clr_values]
-		
-		# Plots all the points calculated with corresponding color values
-		plt.scatter(self.array_x, self.array_y, color=clr_arr_hex)
-		plt.savefig(filename)
+
+		save_image(self.mandels_grid, filename)
 
 
 
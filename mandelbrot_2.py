@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
-import matplotlib.cm as cmx
 import numpy as np
 import sys
 import time
+from raster import save_image
 
 
 def calc_f(z, c):
@@ -25,20 +23,11 @@ def mandelbrot(z: complex, c: complex, escape_time: int = 1000) -> complex:
 
 def save_fig(x_vals, y_vals, clr_grid, filename):
 	"""
-	Saves a mandelbrot scatter-plot as an image-file.
+	Saves the mandelbrot as a png image, one pixel per point.
 	"""
-	
-	clr_values = clr_grid
-	
-	# Normalizes the values of the color array
-	clr_values = clr_values/(np.amax(clr_values)/1000)
-	# Converts the array into an array of hex color values
-	# The power on x is just to increase the color range
-	clr_arr_hex = ["#%06x" % (int(x**2.2)) for x in clr_values]
-	
-	# Plots all the points calculated with corresponding color values
-	plt.scatter(x_vals, y_vals, color=clr_arr_hex)
-	plt.savefig(filename)
+
+	# clr_grid is flattened along the rows of the meshgrid
+	save_image(np.reshape(clr_grid, x_vals.shape).T, filename)
 
 
 
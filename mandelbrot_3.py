@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 
-import matplotlib.pyplot as plt
 import numpy as np
 import sys
 import time
 from numba import jit
+from cardioid import in_main_bulbs
+from raster import save_image
 
+# Compiled copy of the cardioid/bulb check for create_grid
+in_main_bulbs_jit = jit(nopython=True, cache=True)(in_main_bulbs)
 
-@jit(nopython=True)
+
+@jit(nopython=True, cache=True)
 def mandelbrot(z: complex, c: complex) -> complex:
 	"""
 	Computes a iteration for a point in the mandlebrot set
@@ -19,11 +23,14 @@ def mandelbrot(z: complex, c: complex) -> complex:
 	im = 2 * z.real * z.imag + c.imag
 	return complex(re, im)
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def create_grid(xmin: float, xmax: float,
 				ymin: float, ymax: float,
 				res: (int, int),
-				escape_time: int = 1000) -> (np.ndarray, np.ndarray, np.ndarray):
+				escape_time: int = 1000,
+				skip_bulbs: bool = True,
+				periodicity: bool = False,
+				period_tol: float = 1e-10) -> (np.ndarray, np.ndarray, np.ndarray, int):
 	"""
 	Creates a grid of numbers corresponding to the mandelbrot set.
 	
@@ -31,6 +38,13 @@ def create_grid(xmin: float, xmax: float,
 	Runs thorugh all values of z=x+yi in the complex plain and gives
 	a value back based on if it's in or how fast it was computed out
 	of the set.
+
+	Points in the main cardioid or the period-2 bulb are marked as
+	inside right away unless skip_bulbs is False.
+
+	With periodicity set, orbits that return to within period_tol of
+	a saved point are marked as inside. The number of points that
+	stopped early this way is returned as the last value.
 	"""
 	
 	z = complex(0,0)
@@ -50,6 +64,9 @@ def create_grid(xmin: float, xmax: float,
 	array_x = np.zeros(res_x*res_y)
 	array_y = np.zeros(res_x*res_y)
 	
+	# Number of points found to be periodic before escape_time
+	periodic_exits = 0
+
 	# Initial postition values for the 3 arrays
 	pos = 0
 	pos_x = 0
@@ -62,16 +79,37 @@ def create_grid(xmin: float, xmax: float,
 			clr = escape_time
 			c = complex(i, j)
 			f = complex(0, 0)
-			for j in range(escape_time):
-				f = mandelbrot(f, c)
-				if abs(f) > 2:
-					mandels_grid[pos_x][pos_y] = clr
-					break
-				else:
-					if j == escape_time-1:
+			saved = complex(0, 0)
+			steps = 0
+			step_limit = 2
+			if skip_bulbs and in_main_bulbs_jit(c.real, c.imag):
+				# The main cardioid and period-2 bulb never escape,
+				# same value as running through all iterations
+				mandels_grid[pos_x][pos_y] = 1
+			else:
+				for j in range(escape_time):
+					f = mandelbrot(f, c)
+					if abs(f) > 2:
 						mandels_grid[pos_x][pos_y] = clr
-						pass
-				clr = clr - 1
+						break
+					else:
+						if j == escape_time-1:
+							mandels_grid[pos_x][pos_y] = clr
+							pass
+					if periodicity:
+						# Orbit came back to the saved point, so it is
+						# periodic and will never escape
+						if abs(f - saved) < period_tol:
+							mandels_grid[pos_x][pos_y] = 1
+							periodic_exits += 1
+							break
+						# Brent's method, move the saved point at every power of two
+						steps += 1
+						if steps == step_limit:
+							saved = f
+							steps = 0
+							step_limit *= 2
+					clr = clr - 1
 			array_x[pos] = c.real
 			array_y[pos] = c.imag
 			pos_y += 1
@@ -79,30 +117,20 @@ def create_grid(xmin: float, xmax: float,
 		pos_x += 1
 		pos_y = 0
 		
-	return array_x, array_y, mandels_grid
+	return array_x, array_y, mandels_grid, periodic_exits
 	
 def save_fig(x_vals, y_vals, clr_grid, filename, mode=1):
 	"""
-	Saves a mandelbrot scatter-plot as an image-file.
+	Saves the mandelbrot as a png image, one pixel per point.
 	"""
-	
-	clr_values = clr_grid.flatten()
-	
-	# Normalizes the values of the color array
-	clr_values = clr_values/(np.amax(clr_values)/1000)
+
 	# Added modes for assignment 4.7
 	if(mode==1):
-		# Converts the array into an array of hex color values
-		# The power on x is just to increase the color range
-		clr_arr_hex = ["#%06x" % (int(x**2.2)) for x in clr_values]
+		save_image(clr_grid, filename, power=2.2)
 	if(mode==2):
-		clr_arr_hex = ["#%06x" % (int(x**1.5)) for x in clr_values]
+		save_image(clr_grid, filename, power=1.5)
 	if(mode==3):
-		clr_arr_hex = ["#%08x" % (int(x**2.2)) for x in clr_values]
-	
-	# Plots all the points calculated with corresponding color values
-	plt.scatter(x_vals, y_vals, color=clr_arr_hex)
-	plt.savefig(filename)
+		save_image(clr_grid, filename, power=2.2, digits=8)
 	
 
 # For when ran by itself, or via mandelbrot.py
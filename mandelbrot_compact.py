@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from cardioid import main_bulbs_mask
+from raster import save_image
+
+class Mandelbrot_compact():
+	def __init__(self, xmin: float, xmax: float,
+				ymin: float, ymax: float,
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, window: (int, int, int, int) = None,
+				dtype=np.float64):
+
+		self.xmin = xmin
+		self.xmax = xmax
+		self.ymin = ymin
+		self.ymax = ymax
+		self.res = res
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = window
+		self.escape_time = escape_time
+		self.skip_bulbs = skip_bulbs
+		# Float type of the points, float32 makes the grid complex64
+		self.dtype = dtype
+		self.clr_values = None
+
+
+	def construct_mandel(self):
+		"""
+		Computes the same values as Mandelbrot_fast, but only iterates
+		the points that haven't escaped yet.
+
+
+		The still active points are kept in compact arrays together with
+		their flat index in the grid. Whenever points escape the arrays
+		are shrunk, so each iteration costs as much as there are live
+		points left. The counts are scattered back into the grid as
+		points drop out.
+		"""
+
+		cx_array = np.linspace(self.xmin, self.xmax, self.res[0], dtype=self.dtype)[self.window[0]:self.window[1]]
+		cy_array = np.linspace(self.ymin, self.ymax, self.res[1], dtype=self.dtype)[self.window[2]:self.window[3]]
+
+		# Flat array in the same order as Mandelbrot_fast.clr_values
+		c_array = np.tile(cx_array, cy_array.size) + np.repeat(cy_array, cx_array.size) * 1j
+		index = np.arange(c_array.size)
+
+		N = np.zeros(c_array.size, dtype=self.dtype)
+
+		if self.skip_bulbs:
+			# Points in the main cardioid or period-2 bulb never escape
+			interior = main_bulbs_mask(c_array.real, c_array.imag)
+			N[interior] = self.escape_time-1
+			c_array = c_array[~interior]
+			index = index[~interior]
+
+		Z = np.zeros_like(c_array)
+		for n in range(self.escape_time):
+			if index.size == 0:
+				break
+
+			Z = Z**2 + c_array
+			alive = Z.real**2 + Z.imag**2 < 2.0
+			if not alive.all():
+				# Store the count of the escaped points and drop them
+				N[index[~alive]] = n
+				Z = Z[alive]
+				c_array = c_array[alive]
+				index = index[alive]
+
+		# Points still left never escaped
+		N[index] = self.escape_time-1
+		self.clr_values = N
+
+
+	def save_fig(self, filename):
+		"""
+		Saves the mandelbrot as a png image, one pixel per point.
+		"""
+
+		# clr_values is flattened row by row along y
+		shape = (self.window[3]-self.window[2], self.window[1]-self.window[0])
+		save_image(self.clr_values.reshape(shape).T, filename, cmap="hsv", vmin=0, vmax=30)
+		print("\nImage saved as: {}".format(filename))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import math
+from decimal import Decimal, localcontext
+import numpy as np
+from raster import save_image
+
+try:
+	import mpmath
+except ImportError:
+	mpmath = None
+
+
+def reference_orbit(cr: Decimal, ci: Decimal, escape_time: int, digits: int) -> np.ndarray:
+	"""
+	Iterates z = z**2 + c for the reference point c=cr+ci*i in
+	arbitrary precision and returns the orbit Z_0, Z_1, ... as complex128.
+
+
+	Uses mpmath if it's installed and decimal otherwise. The orbit
+	stops after escape_time iterations or at the first point outside
+	the escape radius.
+	"""
+
+	orbit = [0j]
+	if mpmath is not None:
+		with mpmath.workdps(digits):
+			c = mpmath.mpc(mpmath.mpf(str(cr)), mpmath.mpf(str(ci)))
+			z = mpmath.mpc(0)
+			for n in range(escape_time):
+				z = z*z + c
+				orbit.append(complex(z))
+				if z.real**2 + z.imag**2 > 4:
+					break
+	else:
+		with localcontext() as ctx:
+			ctx.prec = digits
+			zr = Decimal(0)
+			zi = Decimal(0)
+			for n in range(escape_time):
+				zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+				orbit.append(complex(float(zr), float(zi)))
+				if zr*zr + zi*zi > 4:
+					break
+	return np.array(orbit)
+
+
+def series_skip(orbit: np.ndarray, probes: np.ndarray, series_tol: float) -> (int, np.ndarray):
+	"""
+	Finds how many iterations the series approximation
+	dz_n = A_n*dc + B_n*dc**2 + C_n*dc**3 can skip.
+
+
+	The series is checked against the perturbation iterated exactly for
+	the probe points, usually the corners of the view. Returns the
+	number of iterations to skip and the coefficients (A, B, C) there.
+	"""
+
+	A = B = C = 0j
+	dz = np.zeros_like(probes)
+	skip = 0
+	coefficients = (A, B, C)
+
+	for n in range(len(orbit) - 1):
+		Z = orbit[n]
+		A, B, C = 2*Z*A + 1, 2*Z*B + A*A, 2*Z*C + 2*A*B
+		dz = 2*Z*dz + dz*dz + probes
+
+		series = A*probes + B*probes**2 + C*probes**3
+		error = np.abs(series - dz)
+		# Probes escaping or the series drifting from the exact values ends the skip
+		if np.any(np.abs(orbit[n+1] + dz) > 2) or np.any(error > series_tol*np.abs(dz)):
+			break
+		skip = n + 1
+		coefficients = (A, B, C)
+
+	return skip, coefficients
+
+
+class Mandelbrot_deep():
+	def __init__(self, xmin, xmax, ymin, ymax,
+				res: (int, int), escape_time: int = 1000,
+				window: (int, int, int, int) = None,
+				series_tol: float = 1e-6, glitch_tol: float = 1e-3,
+				max_levels: int = 4):
+		"""
+		Engine for deep zooms using perturbation theory.
+
+
+		The bounds can be given as strings or Decimals to keep more
+		digits than a float64 holds. One reference orbit is computed in
+		arbitrary precision and every pixel is iterated as a float64
+		delta from it. Values count down from escape_time like
+		Mandelbrot_slow, 0 is inside the set.
+		Glitched pixels get another go with a reference in the middle of
+		a smaller cell of the full image, the image is split in 2**level
+		cells a side for max_levels levels. Pixels still glitched after
+		that are iterated on their own in arbitrary precision. The
+		references only depend on the full image, so a window gets the
+		same values as the full render.
+		"""
+
+		self.xmin = Decimal(xmin)
+		self.xmax = Decimal(xmax)
+		self.ymin = Decimal(ymin)
+		self.ymax = Decimal(ymax)
+		self.res = res
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = window
+		self.escape_time = escape_time
+		self.series_tol = series_tol
+		self.glitch_tol = glitch_tol
+		self.max_levels = max_levels
+		self.mandels_grid = None
+		# Iterations skipped by the series, references used and pixels
+		# still glitched after the last level, iterated on their own
+		self.skipped_iterations = 0
+		self.references = 0
+		self.glitched_pixels = 0
+
+
+	def construct_mandel(self):
+		nx = self.window[1] - self.window[0]
+		ny = self.window[3] - self.window[2]
+
+		with localcontext() as ctx:
+			ctx.prec = 50
+			dx = (self.xmax - self.xmin)/(self.res[0] - 1) if self.res[0] > 1 else Decimal(0)
+			dy = (self.ymax - self.ymin)/(self.res[1] - 1) if self.res[1] > 1 else Decimal(0)
+			spacing = max(abs(dx), abs(dy))
+			# Enough digits to tell neighbouring pixels apart, and then some
+			digits = 30
+			if spacing > 0:
+				digits = max(digits, int(-math.log10(float(spacing))) + 20)
+
+		# Full image index of every pixel of the window, in grid order
+		ix = np.repeat(np.arange(self.window[0], self.window[1]), ny)
+		iy = np.tile(np.arange(self.window[2], self.window[3]), nx)
+
+		values = np.zeros(nx*ny, dtype=np.int32)
+		pending = np.arange(nx*ny)
+		self.references = 0
+		self.skipped_iterations = 0
+
+		for level in range(self.max_levels):
+			if pending.size == 0:
+				break
+			cells = 2**level
+			cell = (ix[pending]*cells//self.res[0])*cells + iy[pending]*cells//self.res[1]
+			glitched = []
+			for key in np.unique(cell):
+				index = pending[cell == key]
+				# Middle of the cell in pixels, exact as cells is a power of two
+				center_x = ((2*(key//cells) + 1)*self.res[0] - cells)/(2*cells)
+				center_y = ((2*(key % cells) + 1)*self.res[1] - cells)/(2*cells)
+				with localcontext() as ctx:
+					ctx.prec = digits
+					orbit = reference_orbit(self.xmin + dx*Decimal(center_x), self.ymin + dy*Decimal(center_y),
+											self.escape_time, digits)
+				self.references += 1
+
+				# Pixel offsets from the reference as float64 deltas
+				pixel_dc = (ix[index] - center_x)*float(dx) + 1j*((iy[index] - center_y)*float(dy))
+				skip = 0
+				dz = np.zeros_like(pixel_dc)
+				if level == 0:
+					# Corners of the full image, not of the window
+					corner_x = (np.array([0, self.res[0] - 1]) - center_x)*float(dx)
+					corner_y = (np.array([0, self.res[1] - 1]) - center_y)*float(dy)
+					corners = (corner_x[:, None] + 1j*corner_y[None, :]).ravel()
+					skip, (A, B, C) = series_skip(orbit, corners, self.series_tol)
+					if skip > 0:
+						dz = A*pixel_dc + B*pixel_dc**2 + C*pixel_dc**3
+					self.skipped_iterations = skip
+
+				glitched.append(self.iterate_pixels(orbit, index, pixel_dc, dz, skip, values))
+			pending = np.concatenate(glitched)
+
+		for index in pending:
+			values[index] = self.direct_value(self.xmin + dx*int(ix[index]), self.ymin + dy*int(iy[index]), digits)
+		self.glitched_pixels = pending.size
+		self.mandels_grid = values.reshape((nx, ny))
+
+
+	def direct_value(self, cr: Decimal, ci: Decimal, digits: int) -> int:
+		"""
+		Value of the point cr+ci*i iterated in arbitrary precision, slow
+		but never glitched.
+		"""
+
+		with localcontext() as ctx:
+			ctx.prec = digits
+			orbit = reference_orbit(cr, ci, self.escape_time, digits)
+		escaped = len(orbit) - 1
+		if escaped == self.escape_time and abs(orbit[-1]) <= 2:
+			return 0
+		return self.escape_time - escaped + 1
+
+
+	def iterate_pixels(self, orbit: np.ndarray, index: np.ndarray, dc: np.ndarray,
+					   dz: np.ndarray, start: int, values: np.ndarray) -> np.ndarray:
+		"""
+		Iterates the pixel deltas dz = 2*Z*dz + dz**2 + dc from iteration
+		start, writes the values of escaped pixels and returns the
+		indices of the glitched ones.
+
+
+		A pixel is glitched if |Z+dz| gets much smaller than |Z|, where
+		float64 can't hold the delta precisely, or if it outlives a
+		reference orbit that escaped.
+		"""
+
+		glitched = []
+		last = min(self.escape_time, len(orbit) - 1)
+		for n in range(start, last):
+			if index.size == 0:
+				break
+			dz = 2*orbit[n]*dz + dz*dz + dc
+			z = orbit[n+1] + dz
+			magnitude = z.real**2 + z.imag**2
+
+			escaped = magnitude > 4
+			glitch = ~escaped & (magnitude < self.glitch_tol**2*abs(orbit[n+1])**2)
+			done = escaped | glitch
+			if done.any():
+				values[index[escaped]] = self.escape_time - n
+				glitched.append(index[glitch])
+				keep = ~done
+				index = index[keep]
+				dc = dc[keep]
+				dz = dz[keep]
+
+		if last < self.escape_time:
+			# The reference escaped before these pixels did
+			glitched.append(index)
+		else:
+			# Never escaped, inside the set
+			values[index] = 0
+
+		if len(glitched) == 0:
+			return np.zeros(0, dtype=np.intp)
+		return np.concatenate(glitched)
+
+
+	def save_fig(self, filename):
+		"""
+		Saves the mandelbrot as a png image, one pixel per point.
+		"""
+
+		save_image(self.mandels_grid, filename)
+		print("\nImage saved as: {}".format(filename))
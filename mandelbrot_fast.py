@@ -1,24 +1,32 @@
 #!/usr/bin/env python3
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors
 import time
+from cardioid import main_bulbs_mask
+from raster import save_image
 
 class Mandelbrot_fast():
 	def __init__(self, xmin: float, xmax: float,
 				ymin: float, ymax: float,
-				res: (int, int), escape_time: int = 1000):
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, window: (int, int, int, int) = None,
+				dtype=np.float64):
 
 		self.xmin = xmin
 		self.xmax = xmax
 		self.ymin = ymin
 		self.ymax = ymax
 		self.res = res
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = window
 		self.escape_time = escape_time
-		self.mandels_grid = np.zeros(res)
+		self.skip_bulbs = skip_bulbs
+		# Float type of the points, float32 makes the grid complex64
+		self.dtype = dtype
 		self.clr_values = None
-		self.map = np.zeros((self.res[0],self.res[1]))
 
 
 	def meshgrid(self, *xi, copy=True, sparse=False, indexing='xy'):
@@ -55,18 +63,24 @@ class Mandelbrot_fast():
 	def construct_mandel(self):
 		#numpy utilization!
 
-		cx_array = np.linspace(self.xmin, self.xmax, self.res[0])
-		cy_array = np.linspace(self.ymin, self.ymax, self.res[1])
+		cx_array = np.linspace(self.xmin, self.xmax, self.res[0], dtype=self.dtype)[self.window[0]:self.window[1]]
+		cy_array = np.linspace(self.ymin, self.ymax, self.res[1], dtype=self.dtype)[self.window[2]:self.window[3]]
 		
 		#self.mandels_grid = np.meshgrid(cx_array, cy_array)
 		#c_array = self.mandels_grid[0] + self.mandels_grid[1] * 1j
 
 		mandels_grid_0, mandels_grid_1 = self.meshgrid(cx_array, cy_array)
 		c_array = mandels_grid_0 + mandels_grid_1 * 1j
-		print(c_array)
 
 		N=np.zeros_like(c_array)
 		Z=np.zeros_like(c_array)
+		if self.skip_bulbs:
+			# Points in the main cardioid or period-2 bulb never escape,
+			# give them the final count and move them out of the bailout
+			# radius so the loop below leaves them alone.
+			interior = main_bulbs_mask(c_array.real, c_array.imag)
+			N[interior] = self.escape_time-1
+			Z[interior] = 2.0
 		for n in range(self.escape_time):
 			i=np.less(Z.real**2+Z.imag**2, 2.0)
 			N[i]=n
@@ -79,18 +93,14 @@ class Mandelbrot_fast():
 
 	def save_fig(self, filename):
 		"""
-		#Saves a mandelbrot scatter-plot as an image-file.
+		Saves the mandelbrot as a png image, one pixel per point.
 		"""
 
-		
-		cmap = plt.cm.hsv
-		norm = matplotlib.colors.Normalize(vmin=0, vmax=30)
-		
-		# Converts the array into an array of hex color values
-		#The power on x is just to increase the color range
-		#clr_arr_hex = ["#%06x" % (int(x**2.2)) for x in self.clr_values]
-		plt.scatter(self.mandels_grid[0], self.mandels_grid[1], marker="+", color=cmap(norm(self.clr_values.real)))
-		plt.savefig(filename, dpi=1000)
+		# clr_values is flattened row by row along y
+		shape = (self.window[3]-self.window[2], self.window[1]-self.window[0])
+		grid = self.clr_values.real.reshape(shape).T
+		save_image(grid, filename, cmap="hsv", vmin=0, vmax=30)
+		print("\nImage saved as: {}".format(filename))
 
 		"""
 	def mandelbrot_calculation(self, z: complex, c: complex) -> complex:
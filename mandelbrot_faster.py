@@ -1,98 +1,168 @@
 #!/usr/bin/env python3
 
+import math
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
 import time
-from numba.experimental import jitclass
-from numba import int32, float32, float64
-import numba as nb
-
-
-spec = [
-	('xmin', float32),
-	('xmax', float32),
-	('ymin', float32),
-	('ymax', float32),
-	('resx', int32),
-	('resy', int32),
-	('escape_time', int32),
-	('mandels_grid', float64[:,:]),
-	('clr_values', float64[:]),
-	('array_x', float64[:]),
-	('array_y', float64[:]),
-]
-
-@jitclass(spec)
+from numba import njit
+from cardioid import in_main_bulbs
+from raster import save_image
+
+# Compiled copy of the cardioid/bulb check for the kernels below
+in_main_bulbs_jit = njit(cache=True)(in_main_bulbs)
+
+
+@njit(cache=True)
+def lattice(start: float, stop: float, num: int, first: int, last: int, out: np.ndarray):
+	"""
+	Writes points first to last of np.linspace(start, stop, num) into
+	out, rounded to the type of out.
+
+
+	Uses numba's linspace, the points are the same the engines had
+	when they were jitclasses.
+	"""
+
+	out[:] = np.linspace(start, stop, num)[first:last]
+
+
+@njit(cache=True)
+def mandelbrot_calculation(zr, zi, cr, ci):
+	"""
+	Computes a iteration for a point in the mandlebrot set
+	
+	mandelbrot(z, c) = z**2 + c
+
+	z and c are split in real and imaginary parts, so a
+	float32 grid keeps the whole orbit in float32.
+	"""
+	
+	re = zr*zr - zi*zi + cr
+	im = (zr + zr)*zi + ci
+	return re, im
+
+
+@njit(cache=True)
+def mandelbrot_value(cr, ci, escape_time: int, skip_bulbs: bool,
+					 periodicity: bool, period_tol: float) -> (int, bool):
+	"""
+	Counts down from escape_time until c=cr+ci*i escapes, also returns
+	whether the orbit was found to be periodic.
+	"""
+
+	# The main cardioid and period-2 bulb never escape
+	if skip_bulbs and in_main_bulbs_jit(cr, ci):
+		return 0, False
+
+	val = escape_time
+	# Zero of the same type as c
+	zr = cr - cr
+	zi = ci - ci
+	# Saved orbit point and step counters for periodicity checking
+	saved_r = zr
+	saved_i = zi
+	steps = 0
+	step_limit = 2
+	while val > 0:
+		zr, zi = mandelbrot_calculation(zr, zi, cr, ci)
+		if math.hypot(zr, zi) > 2:
+			return val, False
+		val = val -1
+		if periodicity:
+			# Orbit came back to the saved point, so it is periodic
+			# and will never escape
+			if math.hypot(zr - saved_r, zi - saved_i) < period_tol:
+				return 0, True
+			# Brent's method, move the saved point at every power of two
+			steps += 1
+			if steps == step_limit:
+				saved_r = zr
+				saved_i = zi
+				steps = 0
+				step_limit *= 2
+
+	return val, False
+
+
+@njit(cache=True)
+def fill_grid(cx_range: np.ndarray, cy_range: np.ndarray, escape_time: int,
+			  skip_bulbs: bool, periodicity: bool, period_tol: float,
+			  mandels_grid: np.ndarray, array_x: np.ndarray, array_y: np.ndarray) -> int:
+	"""
+	Fills mandels_grid with the value of every point and array_x,
+	array_y with the points, returns the number of periodic exits.
+	"""
+
+	periodic_exits = 0
+	for xIndex in range(cx_range.size):
+		for yIndex in range(cy_range.size):
+			value, periodic = mandelbrot_value(cx_range[xIndex], cy_range[yIndex], escape_time,
+											   skip_bulbs, periodicity, period_tol)
+			mandels_grid[xIndex, yIndex] = value
+			periodic_exits += periodic
+			array_x[xIndex*cy_range.size+yIndex] = cx_range[xIndex]
+			array_y[xIndex*cy_range.size+yIndex] = cy_range[yIndex]
+	return periodic_exits
+
+
 class Mandelbrot_faster():
+	# Float type of the bounds and points
+	float_type = np.float64
+
 	def __init__(self, xmin: float, xmax: float,
 				ymin: float, ymax: float,
-				res: (int, int), escape_time: int = 1000):
-
-		self.xmin = xmin
-		self.xmax = xmax
-		self.ymin = ymin
-		self.ymax = ymax
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, periodicity: bool = False,
+				period_tol: float = 1e-10, window: (int, int, int, int) = None):
+
+		# Used to be a jitclass, the loops are now compiled functions
+		# so numba can cache them on disk between runs
+		self.xmin = self.float_type(xmin)
+		self.xmax = self.float_type(xmax)
+		self.ymin = self.float_type(ymin)
+		self.ymax = self.float_type(ymax)
 		self.resx = res[0]
 		self.resy = res[1]
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = tuple(window)
+		nx = window[1]-window[0]
+		ny = window[3]-window[2]
 		self.escape_time = escape_time
-		self.mandels_grid = np.zeros((self.resx, self.resy))
-		self.clr_values = np.zeros(self.resx*self.resy)
-		self.array_x = np.zeros(self.resx*self.resy)
-		self.array_y = np.zeros(self.resx*self.resy)
+		self.skip_bulbs = skip_bulbs
+		self.periodicity = periodicity
+		self.period_tol = period_tol
+		# Number of points found to be periodic before escape_time
+		self.periodic_exits = 0
+		self.mandels_grid = np.zeros((nx, ny))
+		self.clr_values = np.zeros(nx*ny)
+		self.array_x = np.zeros(nx*ny, self.float_type)
+		self.array_y = np.zeros(nx*ny, self.float_type)
 		#self.clr_arr_hex = np.chararray(self.resx*self.resy)
 		#self.clr_arr_hex = empty_int64_list()
 
 
-	def mandelbrot_calculation(self, z: complex, c: complex) -> complex:
-		"""
-		Computes a iteration for a point in the mandlebrot set
-		
-		mandelbrot(z, c) = z**2 + c
-		"""
-		
-		re = z.real**2 - z.imag**2 + c.real
-		im = 2 * z.real * z.imag + c.imag
-		return complex(re, im)
-
-
-	def mandelbrot_value(self, c: complex) -> int:
-		val = self.escape_time
-		f = complex(0,0)
-		while val > 0:
-			f = self.mandelbrot_calculation(f,c)
-			if abs(f) > 2:
-				return val
-			val = val -1
-
-		return val
-		
-
 	def construct_mandel(self):
-		z = complex(0,0)
+		# Rounded to the float type of the class
+		cx_range = np.zeros(self.window[1]-self.window[0], self.float_type)
+		cy_range = np.zeros(self.window[3]-self.window[2], self.float_type)
+		lattice(self.xmin, self.xmax, self.resx, self.window[0], self.window[1], cx_range)
+		lattice(self.ymin, self.ymax, self.resy, self.window[2], self.window[3], cy_range)
 
-		cx_range = np.linspace(self.xmin, self.xmax, self.resx)
-		cy_range = np.linspace(self.ymin, self.ymax, self.resy)
-		
-
-		for xIndex, xValue in enumerate(cx_range):
-			for yIndex, yValue in enumerate(cy_range):
-				self.mandels_grid[xIndex][yIndex] = self.mandelbrot_value(complex(xValue, yValue))
-				self.array_x[xIndex+xIndex*yIndex] = xValue
-				self.array_y[xIndex+xIndex*yIndex] = yValue
+		self.periodic_exits += fill_grid(cx_range, cy_range, self.escape_time, self.skip_bulbs,
+										 self.periodicity, self.period_tol,
+										 self.mandels_grid, self.array_x, self.array_y)
 
 
 	def save_fig(self, filename):
 		"""
-		#Saves a mandelbrot scatter-plot as an image-file.
+		Saves the mandelbrot as a png image, one pixel per point.
 		"""
 
-		
-		cmap = plt.cm.hsv
-		norm = matplotlib.colors.Normalize(vmin=0, vmax=30)
-		
-		# Converts the array into an array of hex color values
-		#The power on x is just to increase the color range
-		#clr_arr_hex = ["#%06x" % (int(x**2.2)) for x in self.clr_values]
-		plt.scatter(self.mandels_grid[0], self.mandels_grid[1], marker="+", color=cmap(norm(self.clr_values.real)))
-		plt.savefig(filename, dpi=1000)
\ No newline at end of file
+		save_image(self.mandels_grid, filename)
+		print("\nImage saved as: {}".format(filename))
+
+
+class Mandelbrot_faster32(Mandelbrot_faster):
+	float_type = np.float32
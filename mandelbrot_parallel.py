@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from numba import njit, prange
+from numba.core import cgutils
+from numba.extending import intrinsic
+from cardioid import in_main_bulbs
+from raster import save_image
+
+# Compiled copy of the cardioid/bulb check for the kernels below
+in_main_bulbs_jit = njit(cache=True)(in_main_bulbs)
+
+
+@njit(cache=True)
+def mandelbrot_value(cr: float, ci: float, escape_time: int, skip_bulbs: bool) -> int:
+	"""
+	Counts down from escape_time until c=cr+ci*i escapes, same values
+	as Mandelbrot_faster.mandelbrot_value in float64.
+
+
+	Compiled separately for float32 and float64 points, the arithmetic
+	is written so numba never promotes a float32 orbit to float64. No
+	fastmath, reordering the float operations changes the values of
+	points near the boundary.
+	"""
+
+	# The main cardioid and period-2 bulb never escape
+	if skip_bulbs and in_main_bulbs_jit(cr, ci):
+		return 0
+
+	val = escape_time
+	# Zero of the same type as c
+	zr = cr - cr
+	zi = ci - ci
+	while val > 0:
+		zr, zi = zr*zr - zi*zi + cr, (zr + zr)*zi + ci
+		if zr*zr + zi*zi > 4.0:
+			return val
+		val = val - 1
+
+	return val
+
+
+@njit(parallel=True, cache=True)
+def fill_grid(cx_range: np.ndarray, cy_range: np.ndarray,
+			  escape_time: int, skip_bulbs: bool, out: np.ndarray):
+	"""
+	Fills out[xIndex, yIndex] with the value of every point, each row
+	of out is handed to its own thread with prange.
+	"""
+
+	for xIndex in prange(cx_range.size):
+		for yIndex in range(cy_range.size):
+			out[xIndex, yIndex] = mandelbrot_value(cx_range[xIndex], cy_range[yIndex],
+												   escape_time, skip_bulbs)
+
+
+@intrinsic
+def read_flag(typingctx, flags, index):
+	"""
+	flags[index], read from memory every time it's called.
+
+
+	A plain read of an array nothing in the loop writes to is moved out
+	of the loop by the compiler, so a flag set by another process
+	during the loop was never seen.
+	"""
+
+	def codegen(context, builder, signature, args):
+		array = context.make_array(flags)(context, builder, args[0])
+		pointer = cgutils.get_item_pointer(context, builder, flags, array, [args[1]])
+		return builder.load_atomic(pointer, "monotonic", flags.dtype.bitwidth // 8)
+
+	return flags.dtype(flags, index), codegen
+
+
+@njit(parallel=True, cache=True)
+def fill_grid_cancellable(cx_range: np.ndarray, cy_range: np.ndarray,
+						  escape_time: int, skip_bulbs: bool, out: np.ndarray,
+						  cancel: np.ndarray, slot: int):
+	"""
+	Same as fill_grid, but every row first checks cancel[slot] and is
+	skipped once it's set, so a render can be stopped from outside.
+	"""
+
+	for xIndex in prange(cx_range.size):
+		if read_flag(cancel, slot) != 0:
+			continue
+		for yIndex in range(cy_range.size):
+			out[xIndex, yIndex] = mandelbrot_value(cx_range[xIndex], cy_range[yIndex],
+												   escape_time, skip_bulbs)
+
+
+@njit(parallel=True, cache=True)
+def fill_points(cx_range: np.ndarray, cy_range: np.ndarray,
+				xs: np.ndarray, ys: np.ndarray,
+				escape_time: int, skip_bulbs: bool, out: np.ndarray):
+	"""
+	Fills out[xs[i], ys[i]] for a list of points only, used to compute
+	the parts of a grid that aren't known already.
+	"""
+
+	for i in prange(xs.size):
+		out[xs[i], ys[i]] = mandelbrot_value(cx_range[xs[i]], cy_range[ys[i]],
+											 escape_time, skip_bulbs)
+
+
+@njit(parallel=True, cache=True)
+def fill_lattice(cx_range: np.ndarray, cy_range: np.ndarray, stride: int,
+				 skip_stride: int, escape_time: int, skip_bulbs: bool, out: np.ndarray):
+	"""
+	Fills out for every stride'th point along both axes, except the
+	points on the skip_stride lattice, those are known already. A
+	skip_stride of 0 skips nothing.
+	"""
+
+	for row in prange((cx_range.size + stride - 1)//stride):
+		xIndex = row*stride
+		for yIndex in range(0, cy_range.size, stride):
+			if skip_stride > 0 and xIndex % skip_stride == 0 and yIndex % skip_stride == 0:
+				continue
+			out[xIndex, yIndex] = mandelbrot_value(cx_range[xIndex], cy_range[yIndex],
+												   escape_time, skip_bulbs)
+
+
+@njit(parallel=True, cache=True)
+def fill_batch(cx_ranges: np.ndarray, cy_ranges: np.ndarray, row_view: np.ndarray,
+			   x_start: np.ndarray, y_start: np.ndarray, ny: np.ndarray,
+			   out_start: np.ndarray, escape_times: np.ndarray,
+			   skip_bulbs: bool, out: np.ndarray):
+	"""
+	Fills out for many views packed together, every row of every view
+	is handed to a thread with prange.
+
+
+	cx_ranges and cy_ranges are the point ranges of all views one after
+	another, row_view is the view of every entry in cx_ranges. View v
+	starts at x_start[v] and y_start[v] in them and its (Nx, ny[v])
+	grid is stored flat in out from out_start[v].
+	"""
+
+	for row in prange(cx_ranges.size):
+		view = row_view[row]
+		# Read once, numba can't tell out doesn't overlap them
+		columns = ny[view]
+		first = y_start[view]
+		escape_time = escape_times[view]
+		cr = cx_ranges[row]
+		start = out_start[view] + (row - x_start[view])*columns
+		for yIndex in range(columns):
+			out[start + yIndex] = mandelbrot_value(cr, cy_ranges[first + yIndex],
+												   escape_time, skip_bulbs)
+
+
+def compute_grid(xmin: float, xmax: float,
+				 ymin: float, ymax: float,
+				 res: (int, int), escape_time: int = 1000,
+				 skip_bulbs: bool = True, window: (int, int, int, int) = None,
+				 out: np.ndarray = None, dtype=np.float64,
+				 cancel: np.ndarray = None, slot: int = 0) -> np.ndarray:
+	"""
+	Computes an (Nx, Ny) grid of mandelbrot values on all cores.
+
+
+	The values are written into out if it's given, which has to have the
+	shape of the window, otherwise a new int32 array is allocated. The
+	points are computed in dtype, float32 or float64. If cancel is
+	given the rows left are skipped once cancel[slot] is set, the grid
+	is incomplete then.
+	"""
+
+	if window is None:
+		window = (0, res[0], 0, res[1])
+	cx_range = np.linspace(xmin, xmax, res[0], dtype=dtype)[window[0]:window[1]]
+	cy_range = np.linspace(ymin, ymax, res[1], dtype=dtype)[window[2]:window[3]]
+
+	if out is None:
+		out = np.empty((cx_range.size, cy_range.size), dtype=np.int32)
+	elif out.shape != (cx_range.size, cy_range.size):
+		raise ValueError("out has shape {}, expected {}".format(out.shape, (cx_range.size, cy_range.size)))
+
+	if cancel is None:
+		fill_grid(cx_range, cy_range, escape_time, skip_bulbs, out)
+	else:
+		fill_grid_cancellable(cx_range, cy_range, escape_time, skip_bulbs, out, cancel, slot)
+	return out
+
+
+class Mandelbrot_parallel():
+	def __init__(self, xmin: float, xmax: float,
+				ymin: float, ymax: float,
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, window: (int, int, int, int) = None,
+				out: np.ndarray = None, dtype=np.float64):
+
+		self.xmin = xmin
+		self.xmax = xmax
+		self.ymin = ymin
+		self.ymax = ymax
+		self.res = res
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = window
+		self.escape_time = escape_time
+		self.skip_bulbs = skip_bulbs
+		self.dtype = dtype
+		self.mandels_grid = out
+
+
+	def construct_mandel(self):
+		self.mandels_grid = compute_grid(self.xmin, self.xmax, self.ymin, self.ymax,
+										 self.res, self.escape_time, self.skip_bulbs,
+										 self.window, self.mandels_grid, self.dtype)
+
+
+	def save_fig(self, filename):
+		"""
+		Saves the mandelbrot as a png image, one pixel per point.
+		"""
+
+		save_image(self.mandels_grid, filename)
+		print("\nImage saved as: {}".format(filename))
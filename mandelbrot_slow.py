@@ -1,27 +1,43 @@
 #!/usr/bin/env python3
 
-import matplotlib.pyplot as plt
-import matplotlib.colors
 import numpy as np
 #import sys
-from progressbar import progressbar
+from progressbar import ProgressReporter
+from cardioid import in_main_bulbs
+from raster import save_image
 
 
 
 class Mandelbrot_slow():
+	# Draws a progress bar on a terminal, turned off by callers that
+	# report progress themselves
+	show_progress = True
+
 	def __init__(self, xmin: float, xmax: float,
 				ymin: float, ymax: float,
-				res: (int, int), escape_time: int = 1000):
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, periodicity: bool = False,
+				period_tol: float = 1e-10, window: (int, int, int, int) = None):
 
 		self.xmin = xmin
 		self.xmax = xmax
 		self.ymin = ymin
 		self.ymax = ymax
 		self.res = res
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = window
 		self.escape_time = escape_time
-		self.mandels_grid = np.zeros(res)
-		self.array_x = np.zeros(self.res[0]*self.res[1])
-		self.array_y = np.zeros(self.res[0]*self.res[1])
+		self.skip_bulbs = skip_bulbs
+		self.periodicity = periodicity
+		self.period_tol = period_tol
+		# Number of points found to be periodic before escape_time
+		self.periodic_exits = 0
+		self.mandels_grid = np.zeros((window[1]-window[0], window[3]-window[2]))
+		self.array_x = np.zeros(self.mandels_grid.size)
+		self.array_y = np.zeros(self.mandels_grid.size)
 
 
 	def mandelbrot_calculation(self, z: complex, c: complex) -> complex:
@@ -37,13 +53,33 @@ class Mandelbrot_slow():
 
 
 	def mandelbrot_value(self, c: complex) -> int:
+		# The main cardioid and period-2 bulb never escape
+		if self.skip_bulbs and in_main_bulbs(c.real, c.imag):
+			return 0
+
 		val = self.escape_time
 		f = complex(0,0)
+		# Saved orbit point and step counters for periodicity checking
+		saved = complex(0,0)
+		steps = 0
+		step_limit = 2
 		while val > 0:
 			f = self.mandelbrot_calculation(f,c)
 			if abs(f) > 2:
 				return val
 			val = val -1
+			if self.periodicity:
+				# Orbit came back to the saved point, so it is periodic
+				# and will never escape
+				if abs(f - saved) < self.period_tol:
+					self.periodic_exits += 1
+					return 0
+				# Brent's method, move the saved point at every power of two
+				steps += 1
+				if steps == step_limit:
+					saved = f
+					steps = 0
+					step_limit *= 2
 
 		return val
 		
@@ -54,11 +90,14 @@ class Mandelbrot_slow():
 		res_x = self.res[0]
 		res_y = self.res[1]
 
-		cx_range = np.linspace(self.xmin, self.xmax, res_x)
-		cy_range = np.linspace(self.ymin, self.ymax, res_y)
+		cx_range = np.linspace(self.xmin, self.xmax, res_x)[self.window[0]:self.window[1]]
+		cy_range = np.linspace(self.ymin, self.ymax, res_y)[self.window[2]:self.window[3]]
 		
 		prog = 0
 		prog_done = cx_range.size*cy_range.size
+		# Updated once per row, printing for every pixel took a big
+		# part of the runtime
+		progress = ProgressReporter(prog_done, 60, enabled=None if self.show_progress else False)
 
 		for xIndex, xValue in enumerate(cx_range):
 			for yIndex, yValue in enumerate(cy_range):
@@ -66,28 +105,17 @@ class Mandelbrot_slow():
 				self.array_x[prog] = xValue
 				self.array_y[prog] = yValue
 				prog+=1
-				progressbar(prog, prog_done, 60)
+			row = self.mandels_grid[xIndex]
+			progress.update(cy_range.size, int(np.where(row == 0, self.escape_time, self.escape_time - row + 1).sum()))
+		progress.close()
 
 
 	def save_fig(self, filename):
 		"""
-		Saves a mandelbrot scatter-plot as an image-file.
+		Saves the mandelbrot as a png image, one pixel per point.
 		"""
-		
-		clr_values = self.mandels_grid.flatten()
-		cmap = plt.cm.gist_ncar
-		norm = matplotlib.colors.Normalize(vmin=1, vmax=1000)
-		
-		# Normalizes the values of the color array
-		#clr_values = clr_values/(np.amax(clr_values)/1000)
-		# Converts the array into an array of hex color values
-		# The power on x is just to increase the color range
-		#clr_arr_hex = ["#%06x" % (int(x**2.2)) for x in clr_values]
 
-		
-		# Plots all the points calculated with corresponding color values
-		plt.scatter(self.array_x, self.array_y, color=cmap(norm(clr_values)))
-		plt.savefig(filename)
+		save_image(self.mandels_grid, filename, cmap="gist_ncar", vmin=1, vmax=1000)
 		print("\nImage saved as: {}".format(filename))
 
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from numba import njit
+from mandelbrot_parallel import mandelbrot_value, fill_grid
+from raster import save_image
+
+
+@njit(cache=True)
+def compute_pixel(cx_range, cy_range, xIndex, yIndex, escape_time, skip_bulbs, out) -> int:
+	"""
+	Computes out[xIndex, yIndex] unless it is already known,
+	returns 1 if the pixel had to be computed.
+	"""
+
+	if out[xIndex, yIndex] >= 0:
+		return 0
+	out[xIndex, yIndex] = mandelbrot_value(cx_range[xIndex], cy_range[yIndex],
+										   escape_time, skip_bulbs)
+	return 1
+
+
+@njit(cache=True)
+def value_at(cx_range, cy_range, window, xIndex, yIndex, escape_time, skip_bulbs, out):
+	"""
+	Value of pixel xIndex, yIndex of the full image, read from out if
+	it's inside the window and computed otherwise.
+	"""
+
+	if window[0] <= xIndex < window[1] and window[2] <= yIndex < window[3]:
+		return out[xIndex-window[0], yIndex-window[2]]
+	return mandelbrot_value(cx_range[xIndex], cy_range[yIndex], escape_time, skip_bulbs)
+
+
+@njit(cache=True)
+def fill_subdivided(cx_range: np.ndarray, cy_range: np.ndarray,
+					window: (int, int, int, int), escape_time: int, skip_bulbs: bool,
+					min_size: int, max_fill: int, out: np.ndarray) -> int:
+	"""
+	Fills out with the window of the Mariani-Silver algorithm and
+	returns the number of pixels in it that were actually computed.
+
+
+	Only the border of a rectangle is computed, if every border pixel
+	has the same value the inside is filled with it. Otherwise the
+	rectangle is split in four, and rectangles smaller than min_size
+	are computed pixel by pixel. Rectangles bigger than max_fill are
+	always split, as a big border can go around details like the
+	whole set in a zoomed out view.
+
+	cx_range and cy_range are the points of the full image, and the
+	rectangles are always split from the full image, so a tile gets
+	the same values as the full render. Rectangles outside the window
+	are skipped, border pixels outside it are computed (and not
+	counted) only when a fill depends on them.
+	"""
+
+	out[:, :] = -1
+	computed = 0
+	wx0, wx1, wy0, wy1 = window
+	tile_x = cx_range[wx0:wx1]
+	tile_y = cy_range[wy0:wy1]
+
+	# Rectangles (x0, x1, y0, y1) left to do, bounds are inclusive
+	stack = [(0, cx_range.size-1, 0, cy_range.size-1)]
+	while len(stack) > 0:
+		x0, x1, y0, y1 = stack.pop()
+		if x1 < wx0 or x0 >= wx1 or y1 < wy0 or y0 >= wy1:
+			continue
+
+		for xIndex in range(max(x0, wx0), min(x1+1, wx1)):
+			if wy0 <= y0 < wy1:
+				computed += compute_pixel(tile_x, tile_y, xIndex-wx0, y0-wy0, escape_time, skip_bulbs, out)
+			if wy0 <= y1 < wy1:
+				computed += compute_pixel(tile_x, tile_y, xIndex-wx0, y1-wy0, escape_time, skip_bulbs, out)
+		for yIndex in range(max(y0+1, wy0), min(y1, wy1)):
+			if wx0 <= x0 < wx1:
+				computed += compute_pixel(tile_x, tile_y, x0-wx0, yIndex-wy0, escape_time, skip_bulbs, out)
+			if wx0 <= x1 < wx1:
+				computed += compute_pixel(tile_x, tile_y, x1-wx0, yIndex-wy0, escape_time, skip_bulbs, out)
+
+		# Nothing left inside the border
+		if x1 - x0 < 2 or y1 - y0 < 2:
+			continue
+
+		# Big rectangles are always split
+		same = x1 - x0 <= max_fill and y1 - y0 <= max_fill
+		if same:
+			value = value_at(cx_range, cy_range, window, x0, y0, escape_time, skip_bulbs, out)
+			for xIndex in range(x0, x1+1):
+				if (value_at(cx_range, cy_range, window, xIndex, y0, escape_time, skip_bulbs, out) != value
+						or value_at(cx_range, cy_range, window, xIndex, y1, escape_time, skip_bulbs, out) != value):
+					same = False
+					break
+		if same:
+			for yIndex in range(y0+1, y1):
+				if (value_at(cx_range, cy_range, window, x0, yIndex, escape_time, skip_bulbs, out) != value
+						or value_at(cx_range, cy_range, window, x1, yIndex, escape_time, skip_bulbs, out) != value):
+					same = False
+					break
+
+		# Inside of the rectangle clipped to the window
+		ix0 = max(x0+1, wx0)
+		ix1 = min(x1, wx1)
+		iy0 = max(y0+1, wy0)
+		iy1 = min(y1, wy1)
+		if same:
+			if ix0 < ix1 and iy0 < iy1:
+				out[ix0-wx0:ix1-wx0, iy0-wy0:iy1-wy0] = value
+		elif x1 - x0 <= min_size or y1 - y0 <= min_size:
+			for xIndex in range(ix0, ix1):
+				for yIndex in range(iy0, iy1):
+					computed += compute_pixel(tile_x, tile_y, xIndex-wx0, yIndex-wy0,
+											  escape_time, skip_bulbs, out)
+		else:
+			# Split in four, the halves share the middle row and column
+			xMid = (x0 + x1) // 2
+			yMid = (y0 + y1) // 2
+			stack.append((x0, xMid, y0, yMid))
+			stack.append((xMid, x1, y0, yMid))
+			stack.append((x0, xMid, yMid, y1))
+			stack.append((xMid, x1, yMid, y1))
+
+	return computed
+
+
+def compute_grid(xmin: float, xmax: float,
+				 ymin: float, ymax: float,
+				 res: (int, int), escape_time: int = 1000,
+				 skip_bulbs: bool = True, window: (int, int, int, int) = None,
+				 subdivide: bool = True, min_size: int = 4,
+				 max_fill: int = 64, dtype=np.float64) -> (np.ndarray, int):
+	"""
+	Computes an (Nx, Ny) grid of mandelbrot values with rectangle
+	subdivision, returns the grid and how many pixels were computed.
+
+
+	With subdivide set to False every pixel is computed, which gives
+	the exact values of Mandelbrot_parallel for comparisons. The
+	points are computed in dtype, float32 or float64. A window gets the
+	same values as the full grid, see fill_subdivided.
+	"""
+
+	if window is None:
+		window = (0, res[0], 0, res[1])
+	window = tuple(int(n) for n in window)
+	cx_full = np.linspace(xmin, xmax, res[0], dtype=dtype)
+	cy_full = np.linspace(ymin, ymax, res[1], dtype=dtype)
+
+	out = np.empty((window[1]-window[0], window[3]-window[2]), dtype=np.int32)
+	if not subdivide:
+		fill_grid(cx_full[window[0]:window[1]], cy_full[window[2]:window[3]], escape_time, skip_bulbs, out)
+		return out, out.size
+
+	computed = fill_subdivided(cx_full, cy_full, window, escape_time, skip_bulbs, min_size, max_fill, out)
+	return out, computed
+
+
+class Mandelbrot_mariani():
+	def __init__(self, xmin: float, xmax: float,
+				ymin: float, ymax: float,
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, window: (int, int, int, int) = None,
+				subdivide: bool = True, dtype=np.float64):
+
+		self.xmin = xmin
+		self.xmax = xmax
+		self.ymin = ymin
+		self.ymax = ymax
+		self.res = res
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = window
+		self.escape_time = escape_time
+		self.skip_bulbs = skip_bulbs
+		self.subdivide = subdivide
+		self.dtype = dtype
+		self.mandels_grid = None
+		# Pixels computed by the kernel and pixels filled from a border
+		self.computed_pixels = 0
+		self.filled_pixels = 0
+
+
+	def construct_mandel(self):
+		self.mandels_grid, self.computed_pixels = compute_grid(
+			self.xmin, self.xmax, self.ymin, self.ymax, self.res,
+			self.escape_time, self.skip_bulbs, self.window, self.subdivide,
+			dtype=self.dtype)
+		self.filled_pixels = self.mandels_grid.size - self.computed_pixels
+
+
+	def save_fig(self, filename):
+		"""
+		Saves the mandelbrot as a png image, one pixel per point.
+		"""
+
+		save_image(self.mandels_grid, filename)
+		print("\nImage saved as: {}".format(filename))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import contextlib
+import inspect
+import json
+import sys
+import time
+import numpy as np
+from cardioid import main_bulbs_mask
+from tiled import ENGINES, make_engine, pixel_iterations, interior_mask, grid_getter
+
+# Functions called with every finished metrics record
+HOOKS = []
+
+
+def add_hook(callback):
+	"""
+	Calls callback(record) with the metrics dict of every finished render.
+	"""
+
+	HOOKS.append(callback)
+
+
+def remove_hook(callback):
+	HOOKS.remove(callback)
+
+
+def compile_seconds(buffer: list) -> float:
+	"""
+	Wall time spent in numba compiles from the events of an
+	install_recorder("numba:compile") buffer.
+
+
+	Compiles of functions called by the compiled function happen inside
+	the outer compile, so only the outermost ones are counted.
+	"""
+
+	total = 0.0
+	depth = 0
+	start = 0.0
+	for timestamp, compile_event in buffer:
+		if compile_event.is_start:
+			if depth == 0:
+				start = timestamp
+			depth += 1
+		elif compile_event.is_end:
+			depth -= 1
+			if depth == 0:
+				total += timestamp - start
+	return total
+
+
+def skips_bulbs(version: str) -> bool:
+	"""
+	True if the engine of version skips the main cardioid and
+	period-2 bulb by default.
+	"""
+
+	parameter = inspect.signature(ENGINES[version][0].__init__).parameters.get("skip_bulbs")
+	return parameter is not None and bool(parameter.default)
+
+
+class RenderMetrics():
+	def __init__(self, version: str, res: (int, int), escape_time: int = 1000,
+				 histogram_bins: int = 32):
+		"""
+		Structured record of one render.
+
+
+		Phases are timed with the phase() context manager, numba
+		compiles inside a phase are taken out of it and added up as
+		jit_compile. add_grid adds the statistics of the finished
+		iteration grid, finish() adds the total and calls the hooks.
+		"""
+
+		self.version = version
+		self.res = res
+		self.escape_time = escape_time
+		self.histogram_bins = histogram_bins
+		self.phases = {"grid_build": 0.0, "iteration": 0.0, "coloring": 0.0,
+					   "save": 0.0, "jit_compile": 0.0}
+		self.stats = {}
+		self.start = time.perf_counter()
+		self.record = None
+		# Imports the engine now, so the import isn't timed as a phase
+		# and numba is loaded before the first phase if it's needed
+		ENGINES[version]
+
+
+	@contextlib.contextmanager
+	def phase(self, name: str):
+		start = time.perf_counter()
+		# Engines without numba don't import it, there is nothing to record then
+		if "numba" in sys.modules:
+			from numba.core import event
+			with event.install_recorder("numba:compile") as recorder:
+				yield
+			compile_time = compile_seconds(recorder.buffer)
+		else:
+			yield
+			compile_time = 0.0
+		elapsed = time.perf_counter() - start
+		self.phases[name] = self.phases.get(name, 0.0) + elapsed - compile_time
+		self.phases["jit_compile"] += compile_time
+
+
+	def add_grid(self, grid: np.ndarray, xmin: float, xmax: float,
+				 ymin: float, ymax: float, window: (int, int, int, int) = None,
+				 mandel = None):
+		"""
+		Adds iteration and escape statistics of an (Nx, Ny) grid.
+
+
+		equivalent_iterations are the z steps a plain escape time loop
+		needs for the points that weren't skipped by the bulb check,
+		worked out from the values. Engines that fill or cut points
+		short run fewer, those are reported from the engine when it's
+		given, pixels filled by Mariani-Silver and periodicity exits.
+		"""
+
+		if window is None:
+			window = (0, self.res[0], 0, self.res[1])
+		iterations = pixel_iterations(self.version, grid, self.escape_time)
+		interior = interior_mask(self.version, grid, self.escape_time)
+
+		bulbs = np.zeros(grid.shape, dtype=bool)
+		if (getattr(mandel, "skip_bulbs", False) if mandel is not None else skips_bulbs(self.version)):
+			cx = np.linspace(float(xmin), float(xmax), self.res[0])[window[0]:window[1]]
+			cy = np.linspace(float(ymin), float(ymax), self.res[1])[window[2]:window[3]]
+			bulbs = main_bulbs_mask(cx[:, None], cy[None, :])
+
+		pixels = grid.size
+		escaped = iterations[~interior]
+		# Log spaced bins, most points escape within the first few iterations
+		bins = np.unique(np.geomspace(1, self.escape_time + 1, self.histogram_bins + 1).astype(np.int64))
+		counts, edges = np.histogram(escaped, bins=bins)
+		self.stats = {
+			"pixels": pixels,
+			"equivalent_iterations": int(iterations[~bulbs].sum()),
+			"escaped": float(escaped.size/pixels),
+			"interior": float(interior.sum()/pixels),
+			"skipped": {
+				"bulbs": float(bulbs.sum()/pixels),
+				"filled": float(getattr(mandel, "filled_pixels", 0)/pixels),
+				"periodic": float(getattr(mandel, "periodic_exits", 0)/pixels),
+			},
+			"escape_histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+		}
+
+
+	def finish(self) -> dict:
+		"""
+		Builds the record and calls every hook with it.
+		"""
+
+		self.record = {"version": self.version,
+					   "res": list(self.res),
+					   "escape_time": self.escape_time,
+					   "phases_s": dict(self.phases),
+					   "total_s": time.perf_counter() - self.start}
+		self.record.update(self.stats)
+		for callback in HOOKS:
+			callback(self.record)
+		return self.record
+
+
+	def save(self, filename: str):
+		with open(filename, "w") as f:
+			json.dump(self.record if self.record is not None else self.finish(), f, indent=2)
+
+
+def render_with_metrics(version: str, xmin: float, xmax: float,
+						ymin: float, ymax: float, res: (int, int),
+						escape_time: int = 1000, dtype=np.float64) -> (np.ndarray, dict):
+	"""
+	Renders with the engine of version and returns the (Nx, Ny) grid
+	together with its metrics record, which is also sent to the hooks.
+	"""
+
+	metrics = RenderMetrics(version, res, escape_time)
+	with metrics.phase("grid_build"):
+		mandel = make_engine(version, xmin, xmax, ymin, ymax, res, escape_time, dtype=dtype)
+	with metrics.phase("iteration"):
+		mandel.construct_mandel()
+	grid = grid_getter(version)(mandel)
+	metrics.add_grid(grid, xmin, xmax, ymin, ymax, mandel=mandel)
+	return grid, metrics.finish()
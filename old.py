@@ -1,43 +1,95 @@
 #!/usr/bin/env python3
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors
 import time
-from numba.experimental import jitclass
-from numba import int32, float32, float64
-import numba as nb
-
-spec = [
-	('xmin', float32),
-	('xmax', float32),
-	('ymin', float32),
-	('ymax', float32),
-	('resx', int32),
-	('resy', int32),
-	('escape_time', int32),
-	('clr_values', float64[:]),
-	('cx_array', float64[:]),
-	('cy_array', float64[:]),
-]
-
-@jitclass(spec)
+from numba import njit
+from cardioid import main_bulbs_mask
+from mandelbrot_faster import lattice
+from raster import save_image
+
+# Compiled copy of the cardioid/bulb mask for iterate
+main_bulbs_mask_jit = njit(cache=True)(main_bulbs_mask)
+
+
+@njit(cache=True)
+def mesh1(x_arr, y_arr):
+	big_x = np.zeros(y_arr.size*x_arr.size)
+	big_x = big_x.reshape((y_arr.size,x_arr.size))
+	num_of_arrays = y_arr.size
+	for yIndex in range(num_of_arrays):
+		for xIndex, xValue in enumerate(x_arr):
+			big_x[yIndex][xIndex] = xValue
+	return big_x
+
+
+@njit(cache=True)
+def mesh2(x_arr, y_arr):
+	big_x = np.zeros(y_arr.size*x_arr.size)
+	big_x = big_x.reshape((y_arr.size,x_arr.size))
+	num_of_arrays = x_arr.size
+	for yIndex, yValue in enumerate(y_arr):
+		for xIndex, xValue in enumerate(x_arr):
+			big_x[yIndex][xIndex] = yValue
+	return big_x
+
+
+@njit(cache=True)
+def iterate(c_array: np.ndarray, escape_time: int, skip_bulbs: bool) -> np.ndarray:
+	"""
+	Escape counts of every point of the flat c_array, counting up to
+	escape_time-1 for points that never escape.
+	"""
+
+	N=np.zeros_like(c_array)
+	Z=np.zeros_like(c_array)
+	if skip_bulbs:
+		# Points in the main cardioid or period-2 bulb never escape,
+		# give them the final count and move them out of the bailout
+		# radius so the loop below leaves them alone.
+		interior = main_bulbs_mask_jit(c_array.real, c_array.imag)
+		N[interior] = escape_time-1
+		Z[interior] = 2.0
+	for n in range(escape_time):
+		i=np.less(Z.real**2+Z.imag**2, 2.0)
+		N[i]=n
+		Z[i]=Z[i]**2+c_array[i]
+	#self.clr_values=N.flatten()
+	return N.real.flatten()
+
+
 class Mandelbrot_fastest():
+	# Float type of the points and complex type of the orbits
+	float_type = np.float64
+	complex_type = np.complex128
+
 	def __init__(self, xmin: float, xmax: float,
 				ymin: float, ymax: float,
-				res: (int, int), escape_time: int = 1000):
-
-		self.xmin = xmin
-		self.xmax = xmax
-		self.ymin = ymin
-		self.ymax = ymax
+				res: (int, int), escape_time: int = 1000,
+				skip_bulbs: bool = True, window: (int, int, int, int) = None):
+
+		# Used to be a jitclass, the loops are now compiled functions
+		# so numba can cache them on disk between runs
+		self.xmin = self.float_type(xmin)
+		self.xmax = self.float_type(xmax)
+		self.ymin = self.float_type(ymin)
+		self.ymax = self.float_type(ymax)
 		self.resx = res[0]
 		self.resy = res[1]
+		# Pixel range (x0, x1, y0, y1) of the res grid to compute,
+		# used to render a tile of a bigger image
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		self.window = tuple(window)
 		self.escape_time = escape_time
+		self.skip_bulbs = skip_bulbs
 		#self.mandels_grid = np.zeros(res)
-		self.clr_values = np.zeros(self.resx*self.resy)
-		self.cx_array = np.linspace(self.xmin, self.xmax, res[0])
-		self.cy_array = np.linspace(self.ymin, self.ymax, res[1])
+		# Rounded to the float type of the class
+		self.cx_array = np.zeros(window[1]-window[0], self.float_type)
+		self.cy_array = np.zeros(window[3]-window[2], self.float_type)
+		lattice(self.xmin, self.xmax, res[0], window[0], window[1], self.cx_array)
+		lattice(self.ymin, self.ymax, res[1], window[2], window[3], self.cy_array)
+		self.clr_values = np.zeros(self.cx_array.size*self.cy_array.size, self.float_type)
+		self.c_array = np.zeros(0, self.complex_type)
 		#self.mandels_grid_0 = None
 		#self.mandels_grid_1 = None
 
@@ -74,22 +126,10 @@ class Mandelbrot_fastest():
 		return output
 
 	def mesh1(self, x_arr, y_arr):
-		big_x = np.zeros(y_arr.size*x_arr.size)
-		big_x = big_x.reshape((y_arr.size,x_arr.size))
-		num_of_arrays = y_arr.size
-		for yIndex in range(num_of_arrays):
-			for xIndex, xValue in enumerate(x_arr):
-				big_x[yIndex][xIndex] = xValue
-		return big_x
+		return mesh1(x_arr, y_arr)
 
 	def mesh2(self, x_arr, y_arr):
-		big_x = np.zeros(y_arr.size*x_arr.size)
-		big_x = big_x.reshape((x_arr.size,y_arr.size))
-		num_of_arrays = x_arr.size
-		for yIndex, yValue in enumerate(y_arr):
-			for xIndex, xValue in enumerate(x_arr):
-				big_x[yIndex][xIndex] = yValue
-		return big_x
+		return mesh2(x_arr, y_arr)
 
 
 
@@ -103,93 +143,29 @@ class Mandelbrot_fastest():
 		mandels_grid_1 = self.mesh2(self.cx_array, self.cy_array)
 		#print(mandels_grid_0)
 		#print(mandels_grid_1)
-		c_array = mandels_grid_0 + mandels_grid_1 * 1j
+		# Built in the complex type of the class, and flat since
+		# numba only supports boolean indexing on 1d arrays
+		c_array = np.zeros(mandels_grid_0.size, self.complex_type)
+		c_array.real[:] = mandels_grid_0.ravel()
+		c_array.imag[:] = mandels_grid_1.ravel()
+		self.c_array = c_array
 		#c_array = self.cx_array + self.cy_array * 1j
 		#print(c_array)
 
-		N=np.zeros_like(c_array)
-		Z=np.zeros_like(c_array)
-		for n in range(self.escape_time):
-			i=np.less(Z.real**2+Z.imag**2, 2.0)
-			N[i]=n
-			Z[i]=Z[i]**2+c_array[i]
-		#self.clr_values=N.flatten()
-		self.clr_values=N.real.flatten()
-
-
-
+		self.clr_values = iterate(c_array, self.escape_time, self.skip_bulbs)
 
 
 	def save_fig(self, filename):
 		"""
-		#Saves a mandelbrot scatter-plot as an image-file.
+		Saves the mandelbrot as a png image, one pixel per point.
 		"""
 
-		
-		cmap = plt.cm.hsv
-		norm = matplotlib.colors.Normalize(vmin=0, vmax=30)
-		
-		# Converts the array into an array of hex color values
-		#The power on x is just to increase the color range
-		#clr_arr_hex = ["#%06x" % (int(x**2.2)) for x in self.clr_values]
-		plt.scatter(self.mandels_grid_0, self.mandels_grid_1, marker="+", color=cmap(norm(self.clr_values.real)))
-		plt.savefig(filename, dpi=1000)
-
-		"""
-	def mandelbrot_calculation(self, z: complex, c: complex) -> complex:
-		"""
-		#Computes a iteration for a point in the mandlebrot set
-		
-		#mandelbrot(z, c) = z**2 + c
-		"""
-		
-		re = z.real**2 - z.imag**2 + c.real
-		im = 2 * z.real * z.imag + c.imag
-		return complex(re, im)
-
-
-	def mandelbrot_value(self, c: complex) -> int:
-		val = self.escape_time
-		f = complex(0,0)
-		while val > 0:
-			f = self.mandelbrot_calculation(f,c)
-			if abs(f) > 2:
-				return val
-			val = val -1
-
-		return val
-
-
-
-	def construct_mandel(self):
-		#numpy utilization!
-
-		#cx_array = np.linspace(self.xmin, self.xmax, self.res[0])
-		#cy_array = np.linspace(self.ymin, self.ymax, self.res[1])
-		#self.mandels_grid = np.meshgrid(cx_array, cy_array)
-		c_array = self.mandels_grid[0] + self.mandels_grid[1] * 1j
-
-		cx_range = np.linspace(self.xmin, self.xmax, self.res[0])
-		cy_range = np.linspace(self.ymin, self.ymax, self.res[1])
-		#self.map = []
-
-		prog = 0
-		prog_total = self.res[0]*self.res[1]
-		for xIndex, xValue in enumerate(cx_range):
-			for yIndex, yValue in enumerate(cy_range):
-				self.map[yIndex][xIndex] = self.mandelbrot_value(complex(xValue, yValue))
-
-
-
-
-	def save_fig(self, filename):
-		
-		# Plots all the points calculated with corresponding color values
-		#plt.scatter(self.mandels_grid[0], self.mandels_grid[1], marker="+", color=cmap(norm(self.clr_values.real)))
-		#plt.savefig(filename, dpi=2000)
-		#self.map = np.array(self.map)
-		plt.imshow(self.map, cmap = "viridis")
-		plt.show()
+		# clr_values is flattened row by row along y
+		grid = self.clr_values.reshape((self.cy_array.size, self.cx_array.size)).T
+		save_image(grid, filename, cmap="hsv", vmin=0, vmax=30)
 		print("\nImage saved as: {}".format(filename))
 
-		"""
\ No newline at end of file
+
+class Mandelbrot_fastest32(Mandelbrot_fastest):
+	float_type = np.float32
+	complex_type = np.complex64
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from tiled import render_tile, iteration_count, FLOAT64_ONLY
+from progressbar import ProgressReporter
+from tile_cache import TileCache
+from precision import check_resolution
+from coloring import apply_table, palette_table
+from raster import write_png_rows
+
+
+def memmap_info(filename: str) -> ((int, int), np.dtype, int):
+	"""
+	Reads the shape, dtype and data offset of a .npy iteration file.
+	"""
+
+	with open(filename, "rb") as f:
+		version = np.lib.format.read_magic(f)
+		if version == (1, 0):
+			shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+		else:
+			shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+		return shape, dtype, f.tell()
+
+
+def open_band(filename: str, row0: int, row1: int, mode: str = "r") -> np.memmap:
+	"""
+	Maps rows row0 to row1 of a .npy iteration file.
+
+
+	Only mapping one band at a time keeps the resident memory
+	bounded by the band size instead of the image size.
+	"""
+
+	shape, dtype, offset = memmap_info(filename)
+	row_bytes = shape[1]*dtype.itemsize
+	return np.memmap(filename, dtype=dtype, mode=mode,
+					 offset=offset + row0*row_bytes, shape=(row1-row0, shape[1]))
+
+
+def iter_bands(filename: str, band_rows: int = 256, reverse: bool = False):
+	"""
+	Yields (row0, band) for every band of a .npy iteration file.
+	"""
+
+	shape, dtype, offset = memmap_info(filename)
+	starts = list(range(0, shape[0], band_rows))
+	if reverse:
+		starts.reverse()
+	for row0 in starts:
+		row1 = min(row0 + band_rows, shape[0])
+		band = open_band(filename, row0, row1)
+		yield row0, np.array(band)
+		del band
+
+
+def render_memmap(filename: str, version: str, xmin: float, xmax: float,
+				  ymin: float, ymax: float, res: (int, int),
+				  escape_time: int = 1000, band_rows: int = 256,
+				  dtype=np.int32, cache: TileCache = None,
+				  float_dtype=np.float64, progress: ProgressReporter = None) -> str:
+	"""
+	Renders the image band by band into a .npy iteration file.
+
+
+	The file holds an (Ny, Nx) array where row j is y = cy[j], so the
+	bands are contiguous on disk. It can be opened again with
+	np.load(filename, mmap_mode="r") or iter_bands. dtype is the type of
+	the stored counts, float_dtype the one the points are computed in.
+	"""
+
+	if version not in FLOAT64_ONLY:
+		check_resolution(xmin, xmax, ymin, ymax, res, float_dtype)
+
+	# Creates the file at full size without writing the data
+	grid = np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=(res[1], res[0]))
+	del grid
+
+	for row0 in range(0, res[1], band_rows):
+		row1 = min(row0 + band_rows, res[1])
+		values = render_tile(version, xmin, xmax, ymin, ymax, res, escape_time,
+							 window=(0, res[0], row0, row1), cache=cache, dtype=float_dtype)
+		band = open_band(filename, row0, row1, mode="r+")
+		band[:] = values.T
+		band.flush()
+		del band
+		if progress is not None:
+			progress.update(values.size, iteration_count(version, values, escape_time))
+
+	if progress is not None:
+		progress.close()
+
+	return filename
+
+
+def save_memmap_image(filename: str, image_filename: str,
+					  band_rows: int = 256, **palette):
+	"""
+	Saves a .npy iteration file as a PNG without loading all of it.
+
+
+	The first pass finds the smallest and biggest count for the color
+	table, the second colors and compresses one band at a time.
+	"""
+
+	shape, dtype, offset = memmap_info(filename)
+	top = 0
+	bottom = None
+	for row0, band in iter_bands(filename, band_rows):
+		top = max(top, int(np.amax(band)))
+		bottom = int(np.amin(band)) if bottom is None else min(bottom, int(np.amin(band)))
+	table = palette_table(top, bottom or 0, **palette)
+
+	# ymax is the first image row, so the bands go in reverse
+	bands = (apply_table(band[::-1].astype(np.intp), table)
+			 for row0, band in iter_bands(filename, band_rows, reverse=True))
+	write_png_rows(image_filename, shape[1], shape[0], table.shape[1], bands)
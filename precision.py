@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import warnings
+import numpy as np
+
+# Float types the engines can compute in, by name
+DTYPES = {"float32": np.float32, "float64": np.float64}
+
+
+def pixel_spacing(xmin: float, xmax: float, ymin: float, ymax: float,
+				  res: (int, int)) -> float:
+	"""
+	Smallest distance between two neighbouring points of the grid.
+	"""
+
+	spacing = [abs(float(xmax) - float(xmin))/(res[0] - 1) if res[0] > 1 else np.inf,
+			   abs(float(ymax) - float(ymin))/(res[1] - 1) if res[1] > 1 else np.inf]
+	return min(spacing)
+
+
+def check_resolution(xmin: float, xmax: float, ymin: float, ymax: float,
+					 res: (int, int), dtype=np.float64) -> bool:
+	"""
+	Warns if neighbouring points can't be told apart in dtype,
+	returns False in that case.
+
+
+	That happens when the pixel spacing is below the distance between
+	two representable numbers around the bounds, the image then turns
+	into blocks of identical points.
+	"""
+
+	largest = max(abs(float(value)) for value in (xmin, xmax, ymin, ymax))
+	resolution = float(np.spacing(np.asarray(largest, dtype=dtype)))
+	spacing = pixel_spacing(xmin, xmax, ymin, ymax, res)
+	if spacing < resolution:
+		warnings.warn("pixel spacing {:.3g} is below the {} resolution {:.3g} at these bounds, "
+					  "use float64 or the deep zoom engine".format(spacing, np.dtype(dtype).name, resolution),
+					  RuntimeWarning)
+		return False
+	return True
@@ -1,3 +1,17 @@
+import sys
+import time
+
+
+def bar(percent, barLength = 20):
+	"""
+	Draws the bar part of the progress bar for percent done.
+	"""
+
+	arrow   = '-' * int(percent/100 * barLength - 1) + '>'
+	spaces  = ' ' * (barLength - len(arrow))
+	return '[%s%s]' % (arrow, spaces)
+
+
 def progressbar(current, total, barLength = 20):
 	"""
 	A progress bar.
@@ -7,7 +21,72 @@ def progressbar(current, total, barLength = 20):
 	"""
 
 	percent = float(current) * 100 / total
-	arrow   = '-' * int(percent/100 * barLength - 1) + '>'
-	spaces  = ' ' * (barLength - len(arrow))
+	print('Progress: %s %d %%' % (bar(percent, barLength), percent), end='\r')
+
+
+class ProgressReporter():
+	def __init__(self, total, barLength = 20, max_rate = 10.0, stream = None, enabled = None):
+		"""
+		Progress of a render, updated once per row or tile.
+
+
+		Finished pixels and iterations are summed up, so tiles can be
+		reported in any order. The bar is redrawn at most max_rate
+		times a second with the ETA, pixels/s and iterations/s. The
+		iterations are the equivalent ones of a plain escape time loop,
+		see tiled.iteration_count. It does nothing unless the stream is
+		a terminal.
+		"""
+
+		self.total = total
+		self.barLength = barLength
+		self.interval = 1.0/max_rate
+		self.stream = sys.stdout if stream is None else stream
+		if enabled is None:
+			enabled = hasattr(self.stream, "isatty") and self.stream.isatty()
+		self.enabled = enabled
+		self.pixels = 0
+		self.iterations = 0
+		self.start = time.perf_counter()
+		self.last_draw = None
+
+
+	def update(self, pixels, iterations = 0):
+		"""
+		Adds pixels finished since the last update and the
+		iterations they took.
+		"""
+
+		self.pixels += pixels
+		self.iterations += iterations
+		if not self.enabled:
+			return
+
+		now = time.perf_counter()
+		if self.last_draw is None or now - self.last_draw >= self.interval:
+			self.draw(now)
+
+
+	def draw(self, now):
+		self.last_draw = now
+		elapsed = max(now - self.start, 1e-9)
+		percent = min(100.0, self.pixels * 100 / self.total) if self.total > 0 else 100.0
+		if self.pixels > 0:
+			eta = elapsed * (self.total - self.pixels) / self.pixels
+		else:
+			eta = 0
+		self.stream.write('Progress: %s %d %% %.2f Mpx/s %.1f Meq-it/s ETA %d:%02d   \r' % (
+			bar(percent, self.barLength), percent, self.pixels/elapsed/1e6,
+			self.iterations/elapsed/1e6, eta // 60, eta % 60))
+		self.stream.flush()
+
+
+	def close(self):
+		"""
+		Draws the final state and moves to the next line.
+		"""
 
-	print('Progress: [%s%s] %d %%' % (arrow, spaces, percent), end='\r')
\ No newline at end of file
+		if self.enabled:
+			self.draw(time.perf_counter())
+			self.stream.write('\n')
+			self.stream.flush()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from mandelbrot_parallel import fill_lattice
+
+
+def upsample(grid: np.ndarray, stride: int) -> np.ndarray:
+	"""
+	Copy of grid where every point takes the value of the nearest
+	lattice point above and left of it, stride apart.
+	"""
+
+	coarse = grid[::stride, ::stride]
+	return np.repeat(np.repeat(coarse, stride, axis=0), stride, axis=1)[:grid.shape[0], :grid.shape[1]]
+
+
+def render_progressive(xmin: float, xmax: float, ymin: float, ymax: float,
+					   res: (int, int), escape_time: int = 1000,
+					   callback=None, strides: tuple = (4, 2, 1),
+					   skip_bulbs: bool = True, dtype=np.float64) -> np.ndarray:
+	"""
+	Computes an (Nx, Ny) grid coarse to fine, same values as
+	mandelbrot_parallel.compute_grid.
+
+
+	The first pass computes every strides[0]'th point along both axes,
+	1/16 of the image with the default strides, and every later pass
+	only the points its lattice adds, so no point is computed twice and
+	the total is the same as a normal render. After every pass
+	callback(preview, stride) is called with the grid upsampled from
+	the points known so far, the last preview is the final grid.
+	"""
+
+	if strides[-1] != 1 or any(coarse % fine for coarse, fine in zip(strides, strides[1:])):
+		raise ValueError("every stride has to divide the one before and the last has to be 1, got {}".format(strides))
+
+	cx_range = np.linspace(xmin, xmax, res[0], dtype=dtype)
+	cy_range = np.linspace(ymin, ymax, res[1], dtype=dtype)
+	grid = np.zeros(res, dtype=np.int32)
+
+	previous = 0
+	for stride in strides:
+		fill_lattice(cx_range, cy_range, stride, previous, escape_time, skip_bulbs, grid)
+		if callback is not None:
+			callback(upsample(grid, stride) if stride > 1 else grid, stride)
+		previous = stride
+	return grid
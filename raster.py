@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import io
+import struct
+import zlib
+import numpy as np
+from coloring import color_counts
+
+
+def grid_to_rgb(grid: np.ndarray, **palette) -> np.ndarray:
+	"""
+	Colors an (Nx, Ny) iteration grid as an (Ny, Nx, 3) uint8 image,
+	the first image row is ymax.
+
+	The palette options are passed on to coloring.color_table.
+	"""
+
+	# x along the columns and y going up the rows
+	return color_counts(np.asarray(grid).T[::-1], **palette)
+
+
+def png_chunk(tag: bytes, data: bytes) -> bytes:
+	return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def write_png(rgb: np.ndarray, filename: str, compress_level: int = 6):
+	"""
+	Writes an (height, width, 3 or 4) uint8 array as a PNG file,
+	one pixel per array element.
+	"""
+
+	height, width, channels = rgb.shape
+	write_png_rows(filename, width, height, channels, [rgb], compress_level)
+
+
+def write_png_rows(filename: str, width: int, height: int, channels: int,
+				   bands, compress_level: int = 6):
+	"""
+	Writes a PNG from an iterable of (rows, width, channels) uint8 arrays,
+	top row first, so the whole image never has to be in memory.
+	"""
+
+	with open(filename, "wb") as f:
+		write_png_stream(f, width, height, channels, bands, compress_level)
+
+
+def write_png_stream(f, width: int, height: int, channels: int,
+					 bands, compress_level: int = 6):
+	"""
+	Same as write_png_rows, into an open binary file object.
+	"""
+
+	color_type = {3: 2, 4: 6}[channels]
+	compressor = zlib.compressobj(compress_level)
+
+	f.write(b"\x89PNG\r\n\x1a\n")
+	f.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)))
+
+	# The image data can be split over any number of IDAT chunks
+	for band in bands:
+		# Every row starts with filter type 0, no filtering
+		raw = np.zeros((band.shape[0], width*channels + 1), dtype=np.uint8)
+		raw[:, 1:] = band.reshape((band.shape[0], width*channels))
+		data = compressor.compress(raw.tobytes())
+		if data:
+			f.write(png_chunk(b"IDAT", data))
+	f.write(png_chunk(b"IDAT", compressor.flush()))
+	f.write(png_chunk(b"IEND", b""))
+
+
+def encode_png(rgb: np.ndarray, compress_level: int = 6) -> bytes:
+	"""
+	Encodes an (height, width, 3 or 4) uint8 array as PNG bytes.
+	"""
+
+	height, width, channels = rgb.shape
+	f = io.BytesIO()
+	write_png_stream(f, width, height, channels, [rgb], compress_level)
+	return f.getvalue()
+
+
+def save_image(grid: np.ndarray, filename: str,
+			   extent: (float, float, float, float) = None, **palette):
+	"""
+	Saves an (Nx, Ny) iteration grid as an Nx x Ny pixel PNG.
+
+
+	palette is passed on to grid_to_rgb. If extent=(xmin, xmax, ymin, ymax)
+	is given the image is drawn with matplotlib instead, with axes
+	showing the coordinates.
+	"""
+
+	rgb = grid_to_rgb(grid, **palette)
+
+	if extent is None:
+		write_png(rgb, filename)
+	else:
+		import matplotlib.pyplot as plt
+		fig, ax = plt.subplots()
+		ax.imshow(rgb, extent=extent)
+		fig.savefig(filename)
+		plt.close(fig)
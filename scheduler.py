@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import asyncio
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from tiled import render_tile, split_tiles
+
+# Cancel flags of the worker slots, set in every worker by init_worker
+CANCEL = None
+
+
+def init_worker(flags):
+	global CANCEL
+	CANCEL = np.frombuffer(flags, dtype=np.int8)
+
+
+def run_job(version: str, view: tuple, res: (int, int), escape_time: int,
+			window: (int, int, int, int), dtype, slot: int) -> np.ndarray:
+	"""
+	Renders one tile in a worker, returns None if it was cancelled.
+
+
+	The parallel engine checks the cancel flag of its slot between rows
+	and stops early, other engines can only be cancelled before they
+	start.
+	"""
+
+	if CANCEL[slot] != 0:
+		return None
+	if version == '6':
+		from mandelbrot_parallel import compute_grid
+		grid = compute_grid(*view, res, escape_time, window=window, dtype=dtype,
+							cancel=CANCEL, slot=slot)
+	else:
+		grid = render_tile(version, *view, res, escape_time, window, dtype=dtype)
+	if CANCEL[slot] != 0:
+		return None
+	return grid
+
+
+class RenderJob():
+	def __init__(self, view: tuple, res: (int, int), window: (int, int, int, int),
+				 priority: float, tag, future: asyncio.Future):
+		"""
+		A queued or running tile, await future for its (Nx, Ny) grid.
+		"""
+
+		self.view = view
+		self.res = res
+		self.window = window
+		self.priority = priority
+		self.tag = tag
+		self.future = future
+		# Worker slot while running
+		self.slot = None
+		self.cancelled = False
+
+
+def center_priority(window: (int, int, int, int), res: (int, int)) -> float:
+	"""
+	Distance of the middle of a window from the middle of the image in
+	pixels, lower is rendered first.
+	"""
+
+	return math.hypot((window[0] + window[1] - res[0])/2, (window[2] + window[3] - res[1])/2)
+
+
+class RenderScheduler():
+	def __init__(self, version: str = '6', workers: int = None,
+				 escape_time: int = 1000, dtype=np.float64):
+		"""
+		Renders tiles on a pool of worker processes from asyncio, in
+		order of priority, and cancels them when they aren't needed.
+
+
+		Every worker has a slot with a cancel flag in shared memory, at
+		most one job runs per slot. Jobs wait in a heap until a slot is
+		free, the lowest priority first. Methods are called from the
+		event loop thread.
+		"""
+
+		self.version = version
+		self.workers = workers if workers is not None else os.cpu_count()
+		self.escape_time = escape_time
+		self.dtype = dtype
+		# Spawned, a fork after numba ran its threads in this process can
+		# hang the workers
+		context = multiprocessing.get_context("spawn")
+		self.flags = context.RawArray("b", self.workers)
+		self.cancel_flags = np.frombuffer(self.flags, dtype=np.int8)
+		self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+										initializer=init_worker, initargs=(self.flags,))
+		self.queue = []
+		self.order = itertools.count()
+		self.free_slots = list(range(self.workers))
+		self.running = set()
+		self.counts = {"submitted": 0, "completed": 0, "cancelled_queued": 0, "cancelled_running": 0}
+
+
+	def submit(self, view: tuple, res: (int, int), window: (int, int, int, int) = None,
+			   priority: float = 0.0, tag = None) -> RenderJob:
+		"""
+		Queues the window of a view, see render_tile, and returns its job.
+		"""
+
+		job = self.push(view, res, window, priority, tag)
+		self.dispatch()
+		return job
+
+
+	def push(self, view: tuple, res: (int, int), window: (int, int, int, int),
+			 priority: float, tag) -> RenderJob:
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		job = RenderJob(tuple(view), tuple(res), tuple(window), priority, tag,
+						asyncio.get_running_loop().create_future())
+		heapq.heappush(self.queue, (priority, next(self.order), job))
+		self.counts["submitted"] += 1
+		return job
+
+
+	def submit_view(self, view: tuple, res: (int, int), tile_size: (int, int) = (128, 128),
+					tag = None) -> list:
+		"""
+		Queues every tile of a view, the ones nearest the center first.
+		"""
+
+		# Queued before dispatching, so the first tiles don't skip the order
+		jobs = [self.push(view, res, window, center_priority(window, res), tag)
+				for window in split_tiles(res, tile_size)]
+		self.dispatch()
+		return jobs
+
+
+	def dispatch(self):
+		"""
+		Starts queued jobs while there are free slots.
+		"""
+
+		while self.free_slots and self.queue:
+			_, _, job = heapq.heappop(self.queue)
+			if job.cancelled:
+				continue
+			job.slot = self.free_slots.pop()
+			self.cancel_flags[job.slot] = 0
+			self.running.add(job)
+			future = asyncio.wrap_future(self.pool.submit(
+				run_job, self.version, job.view, job.res, self.escape_time,
+				job.window, self.dtype, job.slot))
+			future.add_done_callback(lambda future, job=job: self.finished(job, future))
+
+
+	def finished(self, job: RenderJob, future: asyncio.Future):
+		self.running.discard(job)
+		self.free_slots.append(job.slot)
+		job.slot = None
+		if not job.future.done():
+			if future.exception() is not None:
+				job.future.set_exception(future.exception())
+			elif future.result() is None or job.cancelled:
+				job.future.cancel()
+			else:
+				job.future.set_result(future.result())
+				self.counts["completed"] += 1
+		self.dispatch()
+
+
+	def cancel(self, job: RenderJob) -> bool:
+		"""
+		Cancels a job, a running one stops at its next row. Returns
+		False if it was done already.
+		"""
+
+		if job.cancelled or job.future.done():
+			return False
+		job.cancelled = True
+		if job.slot is not None:
+			self.cancel_flags[job.slot] = 1
+			self.counts["cancelled_running"] += 1
+		else:
+			self.counts["cancelled_queued"] += 1
+		# Awaiting the job raises CancelledError right away, the slot is
+		# freed once the worker notices
+		job.future.cancel()
+		return True
+
+
+	def cancel_where(self, predicate) -> int:
+		"""
+		Cancels every queued or running job predicate(job) is true for,
+		like the tiles of an old viewport by their tag. Returns how many.
+		"""
+
+		jobs = [job for _, _, job in self.queue] + list(self.running)
+		return sum(self.cancel(job) for job in jobs if predicate(job))
+
+
+	def cancel_all(self) -> int:
+		return self.cancel_where(lambda job: True)
+
+
+	def close(self):
+		self.cancel_all()
+		self.pool.shutdown()
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from animate import zoom_frames, resample_seeds, render_seeded
+from mandelbrot_parallel import compute_grid
+
+RES = (200, 150)
+ESCAPE_TIME = 500
+
+
+@pytest.mark.parametrize("seed_exterior", [False, True])
+def test_seeded_frames_stay_close_to_full_renders(seed_exterior):
+	views = zoom_frames(-0.745, 0.113, 0.3, 0.1, 6, RES)
+	previous = compute_grid(*views[0], RES, ESCAPE_TIME)
+	for view, next_view in zip(views, views[1:]):
+		seeds = resample_seeds(previous, view, next_view, RES, seed_exterior)
+		grid, computed = render_seeded(next_view, RES, ESCAPE_TIME, seeds)
+		full = compute_grid(*next_view, RES, ESCAPE_TIME)
+
+		# Only sub-pixel filaments can be missed, a handful of pixels
+		assert (grid != full).sum() <= grid.size//1000
+		# Every point without a guess is computed, and the guesses save work
+		assert np.array_equal(grid[seeds < 0], full[seeds < 0])
+		assert computed < grid.size//2
+		previous = full
@@ -0,0 +1,95 @@
+import multiprocessing
+import time
+import numpy as np
+import pytest
+from distributed import Coordinator, QueueManager, run_worker
+from tiled import render_tiled
+
+VIEW = (-0.75, -0.74, 0.1, 0.11)
+RES = (120, 90)
+ESCAPE_TIME = 500
+TILE_SIZE = (50, 40)
+
+
+def start_workers(coordinator: Coordinator, address: (str, int), count: int) -> list:
+	context = multiprocessing.get_context("spawn")
+	workers = [context.Process(target=run_worker, args=(address, coordinator.authkey))
+			   for _ in range(count)]
+	for worker in workers:
+		worker.start()
+	return workers
+
+
+def finish(coordinator: Coordinator, workers: list) -> (np.ndarray, dict):
+	try:
+		grid = coordinator.wait(poll_s=0.01)
+		status = coordinator.queue.status()
+	finally:
+		coordinator.close()
+		for worker in workers:
+			worker.join(30)
+	assert all(worker.exitcode == 0 for worker in workers)
+	return grid, status
+
+
+@pytest.mark.parametrize("version", ['3', '6'])
+def test_distributed_matches_local(version):
+	coordinator = Coordinator(version, *VIEW, RES, ESCAPE_TIME, TILE_SIZE)
+	address = coordinator.start()
+	grid, status = finish(coordinator, start_workers(coordinator, address, 3))
+
+	local = render_tiled(version, *VIEW, RES, ESCAPE_TIME, workers=1, tile_size=TILE_SIZE)
+	assert np.array_equal(grid, local)
+	assert status["finished"] == status["tiles"]
+	assert status["requeued"] == status["failed"] == 0
+
+
+def test_distributed_requeues_failed_and_lost_tiles():
+	coordinator = Coordinator('6', *VIEW, RES, ESCAPE_TIME, TILE_SIZE, lease_s=0.5)
+	address = coordinator.start()
+
+	# A worker that reports a failure, and one that takes a tile and is
+	# never heard from again
+	manager = QueueManager(address=address, authkey=coordinator.authkey)
+	manager.connect()
+	work = manager.work()
+	index, _ = work.take("failing")
+	work.fail("failing", index, "RuntimeError('boom')")
+	work.take("lost")
+	time.sleep(0.6)
+
+	grid, status = finish(coordinator, start_workers(coordinator, address, 2))
+
+	local = render_tiled('6', *VIEW, RES, ESCAPE_TIME, workers=1, tile_size=TILE_SIZE)
+	assert np.array_equal(grid, local)
+	assert status["failed"] == 1
+	assert status["requeued"] == 1
+	assert "failing" not in status["by_worker"] and "lost" not in status["by_worker"]
+
+
+def test_distributed_gives_up_after_max_attempts():
+	# One tile, so it's the one handed out again
+	coordinator = Coordinator('6', *VIEW, RES, ESCAPE_TIME, RES, max_attempts=2)
+	address = coordinator.start()
+	try:
+		manager = QueueManager(address=address, authkey=coordinator.authkey)
+		manager.connect()
+		work = manager.work()
+		for _ in range(2):
+			index, _ = work.take("failing")
+			work.fail("failing", index, "RuntimeError('boom')")
+		assert work.take("failing") is None
+		with pytest.raises(RuntimeError, match="failed 2 times"):
+			coordinator.wait(poll_s=0.01)
+	finally:
+		coordinator.close()
+
+
+def test_distributed_rejects_wrong_authkey():
+	coordinator = Coordinator('6', *VIEW, RES, ESCAPE_TIME, TILE_SIZE)
+	address = coordinator.start()
+	try:
+		with pytest.raises(multiprocessing.AuthenticationError):
+			run_worker(address, b"wrong")
+	finally:
+		coordinator.close()
@@ -0,0 +1,19 @@
+from decimal import Decimal
+from escape_time import escape_time_for_scale, parse_escape_time
+
+
+def test_escape_time_for_scale_whole_set():
+	assert escape_time_for_scale(-2.0, 1.0, -1.5, 1.5) == 100
+
+
+def test_escape_time_for_scale_decimal_deep_zoom():
+	# Narrower than float64 can tell apart, both bounds round to the same float
+	xmin = Decimal("-0.74364388703715870475219")
+	xmax = Decimal("-0.74364388703715870475200")
+	ymin = Decimal("0.13182590420531197")
+	ymax = Decimal("0.13182590420531216")
+	assert float(xmin) == float(xmax)
+
+	escape_time = escape_time_for_scale(xmin, xmax, ymin, ymax)
+	assert escape_time > escape_time_for_scale(-0.75, -0.74, 0.1, 0.11)
+	assert parse_escape_time("auto", xmin, xmax, ymin, ymax) == escape_time
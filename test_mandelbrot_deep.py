@@ -0,0 +1,45 @@
+import numpy as np
+from mandelbrot_deep import Mandelbrot_deep
+from mandelbrot_faster import Mandelbrot_faster
+
+# Shallow enough for float64, with interior points and plenty of glitches
+VIEW = (-0.76, -0.74, 0.09, 0.11)
+RES = (100, 100)
+ESCAPE_TIME = 300
+
+
+def render_deep(**kwargs) -> Mandelbrot_deep:
+	mandel = Mandelbrot_deep(*VIEW, RES, ESCAPE_TIME, **kwargs)
+	mandel.construct_mandel()
+	return mandel
+
+
+def render_faster() -> np.ndarray:
+	mandel = Mandelbrot_faster(*VIEW, RES, ESCAPE_TIME)
+	mandel.construct_mandel()
+	return mandel.mandels_grid
+
+
+def test_deep_matches_faster_on_a_shallow_view():
+	deep = render_deep()
+	faster = render_faster()
+	# Perturbation rounds differently from iterating c directly, only
+	# pixels right at the boundary may land on another iteration
+	assert (deep.mandels_grid != faster).mean() < 0.001
+	assert ((deep.mandels_grid == 0) == (faster == 0)).mean() > 0.999
+
+
+def test_deep_iterates_leftover_glitches_directly():
+	# One reference, whatever it leaves glitched is iterated on its own
+	# instead of counting as inside the set
+	deep = render_deep(max_levels=1)
+	assert deep.references == 1
+	assert deep.glitched_pixels > 0
+	assert (deep.mandels_grid != render_faster()).mean() < 0.001
+
+
+def test_deep_window_matches_full_render():
+	full = render_deep().mandels_grid
+	window = (30, 70, 10, 45)
+	tile = render_deep(window=window).mandels_grid
+	assert np.array_equal(tile, full[30:70, 10:45])
@@ -0,0 +1,14 @@
+import numpy as np
+import pytest
+from mandelbrot_faster import Mandelbrot_faster
+from mandelbrot_parallel import compute_grid
+
+
+@pytest.mark.parametrize("view, res", [
+	((-2.0, 1.0, -1.5, 1.5), (400, 300)),
+	((-0.76, -0.74, 0.09, 0.11), (300, 300)),
+])
+def test_parallel_matches_faster(view, res):
+	faster = Mandelbrot_faster(*view, res, 500)
+	faster.construct_mandel()
+	assert np.array_equal(compute_grid(*view, res, 500), faster.mandels_grid)
@@ -0,0 +1,50 @@
+import importlib
+import sys
+import numpy as np
+import pytest
+from mandelbrot import Mandelbrot
+from mandelbrot_faster import Mandelbrot_faster
+
+# Around the period-3 bulb, most of the view never escapes and none of
+# it is in the main cardioid or the period-2 bulb
+VIEW = (-0.15, -0.10, 0.72, 0.77)
+RES = (30, 30)
+ESCAPE_TIME = 300
+
+
+def test_periodicity_mandelbrot():
+	grids = []
+	for periodicity in (False, True):
+		mandel = Mandelbrot(*VIEW, RES, ESCAPE_TIME, periodicity=periodicity)
+		mandel.construct_mandel()
+		grids.append(mandel.mandels_grid)
+	assert np.array_equal(*grids)
+	assert mandel.periodic_exits > 0
+
+
+@pytest.fixture
+def create_grid(tmp_path, monkeypatch):
+	# mandelbrot_1 renders the view on the command line when imported,
+	# a tiny one here
+	monkeypatch.setattr(sys, "argv", ["mandelbrot_1.py", "1", "-2", "2", "-2", "2", "2", "2",
+									  str(tmp_path/"import.png")])
+	return importlib.import_module("mandelbrot_1").create_grid
+
+
+def test_periodicity_create_grid(create_grid):
+	_, _, plain, plain_exits = create_grid(*VIEW, RES, ESCAPE_TIME)
+	_, _, periodic, periodic_exits = create_grid(*VIEW, RES, ESCAPE_TIME, periodicity=True)
+	assert np.array_equal(plain, periodic)
+	assert plain_exits == 0
+	assert periodic_exits > 0
+
+
+@pytest.mark.parametrize("res", [RES, (200, 200)])
+def test_periodicity_faster(res):
+	grids = []
+	for periodicity in (False, True):
+		mandel = Mandelbrot_faster(*VIEW, res, ESCAPE_TIME, periodicity=periodicity)
+		mandel.construct_mandel()
+		grids.append(mandel.mandels_grid)
+	assert np.array_equal(*grids)
+	assert mandel.periodic_exits > 0
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from tiled import render_pan, render_tile, render_tiled, split_tiles, ENGINES
+
+# (view, res, escape_time, tile_size), the seahorse valley tiles are big
+# enough for the Mariani-Silver subdivision to fill rectangles, and 64
+# leaves partial tiles at the edges
+CASES = {
+	"whole set": ((-2.0, 1.0, -1.5, 1.5), (40, 30), 50, (20, 15)),
+	"seahorse": ((-0.76, -0.74, 0.09, 0.11), (300, 300), 500, (64, 64)),
+}
+
+
+def test_split_tiles_covers_the_image():
+	covered = np.zeros((300, 300), dtype=int)
+	for x0, x1, y0, y1 in split_tiles((300, 300), (64, 64)):
+		covered[x0:x1, y0:y1] += 1
+	assert (covered == 1).all()
+
+
+@pytest.mark.parametrize("version", sorted(ENGINES))
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_tiled_matches_single_render(version, case):
+	view, res, escape_time, tile_size = CASES[case]
+	single = render_tile(version, *view, res, escape_time)
+	tiled = render_tiled(version, *view, res, escape_time, workers=2, tile_size=tile_size)
+	assert tiled.shape == single.shape
+	assert np.array_equal(tiled, single)
+
+
+def test_mariani_silver_fills_in_tiles():
+	# The tiled test above only means something for version 7 if the
+	# tiles actually fill rectangles
+	from mariani_silver import compute_grid
+	view, res, escape_time, tile_size = CASES["seahorse"]
+	window = split_tiles(res, tile_size)[6]
+	tile, computed = compute_grid(*view, res, escape_time, window=window)
+	assert computed < tile.size
+
+
+@pytest.mark.parametrize("version", ['3', '6', '7'])
+@pytest.mark.parametrize("shift", [(13, -9), (-30, 40)])
+def test_render_pan_computes_only_the_exposed_strips(version, shift):
+	view, res, escape_time, _ = CASES["seahorse"]
+	xmin, xmax, ymin, ymax = view
+	dx = (xmax - xmin)/(res[0] - 1)*shift[0]
+	dy = (ymax - ymin)/(res[1] - 1)*shift[1]
+	new_view = (xmin + dx, xmax + dx, ymin + dy, ymax + dy)
+
+	previous = render_tile(version, *view, res, escape_time)
+	grid, computed = render_pan(version, previous, view, new_view, res, escape_time)
+	full = render_tile(version, *new_view, res, escape_time)
+
+	# Columns and rows not in the previous view
+	exposed = np.ones(res, dtype=bool)
+	x0, x1 = max(0, -shift[0]), min(res[0], res[0] - shift[0])
+	y0, y1 = max(0, -shift[1]), min(res[1], res[1] - shift[1])
+	exposed[x0:x1, y0:y1] = False
+	assert computed == exposed.sum()
+	assert np.array_equal(grid[exposed], full[exposed])
+	assert np.array_equal(grid[~exposed], previous[x0+shift[0]:x1+shift[0], y0+shift[1]:y1+shift[1]].ravel())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+import numpy as np
+
+
+class TileCache():
+	def __init__(self, directory: str, max_bytes: int = 1 << 30):
+		"""
+		An on-disk cache of rendered iteration tiles.
+
+
+		Every tile is stored as its own .npy file named after a hash of
+		the render parameters. The file modification time is used as the
+		last use, so the least recently used tiles are removed first when
+		the cache grows past max_bytes. The directory is scanned once
+		here, after that the sizes and order of use are kept in memory.
+		"""
+
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		os.makedirs(directory, exist_ok=True)
+
+		# Size of every tile by key, least recently used first
+		self.sizes = OrderedDict()
+		self.total = 0
+		entries = []
+		for name in os.listdir(directory):
+			if not name.endswith(".npy"):
+				continue
+			try:
+				info = os.stat(os.path.join(directory, name))
+			except OSError:
+				continue
+			entries.append((info.st_mtime, name[:-len(".npy")], info.st_size))
+		for mtime, key, size in sorted(entries):
+			self.sizes[key] = size
+			self.total += size
+
+
+	def track(self, key: str, size: int):
+		"""
+		Records key as the most recently used tile, of size bytes.
+		"""
+
+		self.total += size - self.sizes.pop(key, 0)
+		self.sizes[key] = size
+
+
+	def key(self, version: str, xmin: float, xmax: float,
+			ymin: float, ymax: float, res: (int, int),
+			escape_time: int, window: (int, int, int, int) = None,
+			dtype=np.float64) -> str:
+		"""
+		Canonical hash of the render parameters, the floats are written
+		exactly so nearby viewports never share a key.
+		"""
+
+		if window is None:
+			window = (0, res[0], 0, res[1])
+		# Decimal bounds of deep zooms keep all their digits
+		bounds = [float(value).hex() if isinstance(value, (int, float)) else str(value)
+				  for value in (xmin, xmax, ymin, ymax)]
+		text = "|".join([str(version)] + bounds + [str(int(n)) for n in (*res, escape_time, *window)]
+						+ [np.dtype(dtype).name])
+		return hashlib.sha256(text.encode()).hexdigest()
+
+
+	def path(self, key: str) -> str:
+		return os.path.join(self.directory, key + ".npy")
+
+
+	def get(self, key: str) -> np.ndarray:
+		"""
+		Returns the cached tile, or None if it isn't in the cache.
+		"""
+
+		try:
+			tile = np.load(self.path(key))
+		except (OSError, ValueError):
+			self.misses += 1
+			return None
+
+		# Marks the tile as recently used, the mtime for the next process
+		try:
+			os.utime(self.path(key))
+		except OSError:
+			pass
+		self.track(key, self.sizes.get(key, tile.nbytes))
+		self.hits += 1
+		return tile
+
+
+	def put(self, key: str, tile: np.ndarray):
+		# Written to a temporary file first so other processes never
+		# read a half written tile
+		handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+		with os.fdopen(handle, "wb") as f:
+			np.save(f, tile)
+			size = f.tell()
+		os.replace(temp_path, self.path(key))
+		self.track(key, size)
+		if self.total > self.max_bytes:
+			self.evict()
+
+
+	def evict(self):
+		"""
+		Removes the least recently used tiles until the cache fits in max_bytes.
+		"""
+
+		while self.total > self.max_bytes and self.sizes:
+			key, size = self.sizes.popitem(last=False)
+			self.total -= size
+			try:
+				os.remove(self.path(key))
+			except OSError:
+				# Already removed by another process
+				continue
+			self.evictions += 1
+
+
+	def stats(self) -> dict:
+		lookups = self.hits + self.misses
+		return {"hits": self.hits,
+				"misses": self.misses,
+				"hit_rate": self.hits/lookups if lookups > 0 else 0.0,
+				"evictions": self.evictions}
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+import json
+import multiprocessing
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+from tiled import render_tile
+from escape_time import escape_time_for_scale
+from raster import grid_to_rgb, encode_png
+
+# Square of the complex plane covered by the single tile of zoom 0,
+# (xmin, xmax, ymin, ymax)
+WORLD = (-2.5, 1.5, -2.0, 2.0)
+
+# Deeper tiles have pixels closer than float64 can tell apart
+MAX_ZOOM = 40
+
+TILE_PATH = re.compile(r"^/(\d+)/(\d+)/(\d+)\.png$")
+
+
+def tile_view(z: int, x: int, y: int, tile_size: int = 256) -> (float, float, float, float):
+	"""
+	Bounds of the pixel centers of tile x, y at zoom z, like a slippy
+	map y=0 is the top row.
+
+
+	Zoom z splits WORLD into 2**z by 2**z tiles. The bounds are half a
+	pixel inside the tile, so neighbouring tiles don't both compute
+	the points on their shared edge.
+	"""
+
+	width = (WORLD[1] - WORLD[0])/2**z
+	step = width/tile_size
+	xmin = WORLD[0] + x*width
+	ymax = WORLD[3] - y*width
+	return (xmin + step/2, xmin + width - step/2, ymax - width + step/2, ymax - step/2)
+
+
+def render_png(version: str, z: int, x: int, y: int, tile_size: int = 256,
+			   escape_time: int = None) -> bytes:
+	"""
+	Renders tile x, y at zoom z as PNG bytes, run in the worker pool.
+
+
+	escape_time defaults to escape_time_for_scale of the tile, the same
+	for every tile of a zoom. The colors are fixed between 0 and
+	escape_time so tiles line up without seams.
+	"""
+
+	view = tile_view(z, x, y, tile_size)
+	if escape_time is None:
+		escape_time = escape_time_for_scale(*view)
+	grid = render_tile(version, *view, (tile_size, tile_size), escape_time)
+	return encode_png(grid_to_rgb(grid, cmap="gist_ncar", vmin=0, vmax=escape_time))
+
+
+class PngCache():
+	def __init__(self, max_bytes: int = 64*1024*1024):
+		"""
+		In-memory LRU of encoded tiles, the least recently used tiles
+		are dropped once they take more than max_bytes.
+		"""
+
+		self.max_bytes = max_bytes
+		self.tiles = OrderedDict()
+		self.size = 0
+		self.evictions = 0
+		self.lock = threading.Lock()
+
+
+	def get(self, key: tuple) -> bytes:
+		with self.lock:
+			png = self.tiles.get(key)
+			if png is not None:
+				self.tiles.move_to_end(key)
+			return png
+
+
+	def put(self, key: tuple, png: bytes):
+		with self.lock:
+			if key in self.tiles:
+				return
+			self.tiles[key] = png
+			self.size += len(png)
+			while self.size > self.max_bytes and len(self.tiles) > 1:
+				_, old = self.tiles.popitem(last=False)
+				self.size -= len(old)
+				self.evictions += 1
+
+
+class TileServer():
+	def __init__(self, version: str = '6', workers: int = None,
+				 cache_bytes: int = 64*1024*1024, tile_size: int = 256,
+				 escape_time: int = None, latency_window: int = 10000):
+		"""
+		Serves /z/x/y.png tiles rendered by the engine of version, and
+		counters at /metrics.
+
+
+		Tiles missing from the PngCache are rendered on a pool of
+		worker processes, requests for a tile that is being rendered
+		already wait for that render. Latencies of the last
+		latency_window requests are kept for the percentiles.
+		"""
+
+		if version == '8':
+			raise ValueError("version {} needs arbitrary precision bounds, tiles are float64".format(version))
+		self.version = version
+		self.tile_size = tile_size
+		self.escape_time = escape_time
+		self.cache = PngCache(cache_bytes)
+		# Spawned, a fork after numba ran its threads in this process can
+		# hang the workers
+		self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+		# Futures of the tiles being rendered, by key
+		self.rendering = {}
+		self.lock = threading.Lock()
+		self.counts = {"requests": 0, "hits": 0, "misses": 0, "joined": 0, "errors": 0}
+		self.latencies = deque(maxlen=latency_window)
+		self.started = time.time()
+
+
+	def count(self, name: str, latency: float = None):
+		with self.lock:
+			self.counts[name] += 1
+			if latency is not None:
+				self.latencies.append(latency)
+
+
+	def get_tile(self, z: int, x: int, y: int) -> bytes:
+		"""
+		PNG bytes of a tile, from the cache or rendered.
+		"""
+
+		key = (z, x, y)
+		png = self.cache.get(key)
+		if png is not None:
+			self.count("hits")
+			return png
+
+		with self.lock:
+			future = self.rendering.get(key)
+			joined = future is not None
+			if not joined:
+				future = self.pool.submit(render_png, self.version, z, x, y, self.tile_size, self.escape_time)
+				self.rendering[key] = future
+		self.count("joined" if joined else "misses")
+
+		if joined:
+			return future.result()
+		try:
+			png = future.result()
+		except BaseException:
+			with self.lock:
+				del self.rendering[key]
+			raise
+		# Cached before it's dropped from rendering, so a request in
+		# between finds it in one or the other
+		self.cache.put(key, png)
+		with self.lock:
+			del self.rendering[key]
+		return png
+
+
+	def metrics(self) -> dict:
+		"""
+		Request counters, cache hit rate and latency percentiles in
+		milliseconds.
+		"""
+
+		with self.lock:
+			counts = dict(self.counts)
+			latencies = np.array(self.latencies)
+		tiles = counts["hits"] + counts["misses"] + counts["joined"]
+		record = {"uptime_s": time.time() - self.started,
+				  "version": self.version,
+				  **counts,
+				  "hit_rate": counts["hits"]/tiles if tiles else 0.0,
+				  "cache": {"tiles": len(self.cache.tiles),
+							"bytes": self.cache.size,
+							"max_bytes": self.cache.max_bytes,
+							"evictions": self.cache.evictions},
+				  "rendering": len(self.rendering)}
+		if latencies.size > 0:
+			record["latency_ms"] = {"mean": float(latencies.mean()*1000),
+									"p50": float(np.percentile(latencies, 50)*1000),
+									"p95": float(np.percentile(latencies, 95)*1000),
+									"p99": float(np.percentile(latencies, 99)*1000),
+									"max": float(latencies.max()*1000)}
+		return record
+
+
+	def make_server(self, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+		"""
+		HTTP server answering every request on its own thread, call
+		serve_forever() on it.
+		"""
+
+		tiles = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				start = time.perf_counter()
+				if self.path == "/metrics":
+					self.reply(200, "application/json", json.dumps(tiles.metrics(), indent=2).encode())
+					return
+
+				match = TILE_PATH.match(self.path)
+				if match is None:
+					self.reply(404, "text/plain", b"not found, tiles are /z/x/y.png\n")
+					return
+				z, x, y = (int(value) for value in match.groups())
+				if z > MAX_ZOOM or x >= 2**z or y >= 2**z:
+					self.reply(404, "text/plain", b"no such tile\n")
+					return
+
+				try:
+					png = tiles.get_tile(z, x, y)
+				except Exception as error:
+					tiles.count("errors")
+					self.reply(500, "text/plain", "{}\n".format(error).encode())
+					return
+				tiles.count("requests", time.perf_counter() - start)
+				self.reply(200, "image/png", png)
+
+
+			def reply(self, status: int, content_type: str, body: bytes):
+				self.send_response(status)
+				self.send_header("Content-Type", content_type)
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+
+			def log_message(self, format, *args):
+				# Quiet, a log line per tile slows down load tests
+				pass
+
+		return ThreadingHTTPServer((host, port), Handler)
+
+
+	def close(self):
+		self.pool.shutdown()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+from decimal import Decimal, localcontext
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tile_cache import TileCache
+from engines import ENGINES, FLOAT32_ENGINES, FLOAT64_ONLY, grid_getter, counts_up
+from precision import check_resolution
+from progressbar import ProgressReporter
+
+
+def pixel_iterations(version: str, grid: np.ndarray, escape_time: int) -> np.ndarray:
+	"""
+	Number of z = z**2 + c steps a plain escape time loop needs for
+	every point of the grid, the same for every engine no matter what
+	it skips.
+	"""
+
+	grid = np.real(grid).astype(np.int64)
+	if counts_up(version):
+		# Counts up, escape_time-1 is inside the set
+		return np.minimum(grid + 1, escape_time)
+	# Counts down, 0 is inside the set
+	return np.where(grid == 0, escape_time, escape_time - grid + 1)
+
+
+def interior_mask(version: str, grid: np.ndarray, escape_time: int) -> np.ndarray:
+	"""
+	True for the points of the grid that never escaped.
+	"""
+
+	grid = np.real(grid)
+	if counts_up(version):
+		return grid >= escape_time - 1
+	return grid == 0
+
+
+def iteration_count(version: str, grid: np.ndarray, escape_time: int) -> int:
+	"""
+	Sum of pixel_iterations over the grid.
+	"""
+
+	return int(pixel_iterations(version, grid, escape_time).sum())
+
+
+def make_engine(version: str, xmin: float, xmax: float,
+				ymin: float, ymax: float, res: (int, int),
+				escape_time: int = 1000, window: (int, int, int, int) = None,
+				dtype=np.float64):
+	"""
+	Creates the engine of the given version computing in dtype.
+	"""
+
+	engine = ENGINES[version][0]
+	if np.dtype(dtype) == np.float64:
+		return engine(xmin, xmax, ymin, ymax, res, escape_time, window=window)
+	if version in FLOAT64_ONLY:
+		raise ValueError("version {} only computes in float64".format(version))
+	if version in FLOAT32_ENGINES:
+		return FLOAT32_ENGINES[version](xmin, xmax, ymin, ymax, res, escape_time, window=window)
+	return engine(xmin, xmax, ymin, ymax, res, escape_time, window=window, dtype=dtype)
+
+
+def render_tile(version: str, xmin: float, xmax: float,
+				ymin: float, ymax: float, res: (int, int),
+				escape_time: int = 1000, window: (int, int, int, int) = None,
+				cache: TileCache = None, dtype=np.float64) -> np.ndarray:
+	"""
+	Renders one tile of the image with the engine of the given version.
+
+
+	window is the pixel range (x0, x1, y0, y1) of the full res grid,
+	the returned grid has shape (x1-x0, y1-y0). With a cache the tile
+	is only computed if it isn't stored there already. The engine's own
+	progress bar is off, progress is reported per tile by the caller.
+	"""
+
+	if window is None:
+		window = (0, res[0], 0, res[1])
+
+	if cache is not None:
+		key = cache.key(version, xmin, xmax, ymin, ymax, res, escape_time, window, dtype)
+		tile = cache.get(key)
+		if tile is not None:
+			return tile
+
+	mandel = make_engine(version, xmin, xmax, ymin, ymax, res, escape_time, window, dtype)
+	mandel.show_progress = False
+	mandel.construct_mandel()
+	tile = np.array(grid_getter(version)(mandel))
+
+	if cache is not None:
+		cache.put(key, tile)
+	return tile
+
+
+def lattice_shift(old_view: tuple, new_view: tuple, res: (int, int),
+				  tol: float = 1e-6) -> (int, int):
+	"""
+	Number of pixels (dx, dy) new_view is moved from old_view, or None
+	if the two don't share a pixel lattice.
+
+
+	Both views are (xmin, xmax, ymin, ymax) sampled at res. They share
+	a lattice if the pixel spacing is the same and the move is a whole
+	number of pixels, both within tol of a pixel. Decimal bounds of
+	the deep zoom engine are compared in Decimal.
+	"""
+
+	shift = []
+	with localcontext() as ctx:
+		ctx.prec = 200
+		if any(isinstance(value, Decimal) for value in tuple(old_view) + tuple(new_view)):
+			old_view = [Decimal(str(value)) for value in old_view]
+			new_view = [Decimal(str(value)) for value in new_view]
+		for axis in range(2):
+			n = res[axis]
+			old_min, old_max = old_view[2*axis], old_view[2*axis+1]
+			new_min, new_max = new_view[2*axis], new_view[2*axis+1]
+			if n < 2:
+				if new_min != old_min or new_max != old_max:
+					return None
+				shift.append(0)
+				continue
+			step = (old_max - old_min)/(n - 1)
+			if step == 0:
+				return None
+			# Difference of the spacings over the whole width, in pixels
+			if abs(float(((new_max - new_min) - (old_max - old_min))/step)) > tol:
+				return None
+			offset = float((new_min - old_min)/step)
+			if abs(offset - round(offset)) > tol:
+				return None
+			shift.append(int(round(offset)))
+	return tuple(shift)
+
+
+def render_pan(version: str, previous: np.ndarray, old_view: tuple,
+			   new_view: tuple, res: (int, int), escape_time: int = 1000,
+			   cache: TileCache = None, dtype=np.float64) -> (np.ndarray, int):
+	"""
+	Renders new_view reusing the (Nx, Ny) grid previous of old_view,
+	returns the grid and the number of points computed.
+
+
+	If the views share a pixel lattice, see lattice_shift, the
+	previous grid is shifted and only the exposed strips are rendered
+	with render_tile, otherwise the whole view is. The strips are
+	windows of the full new view, so they are identical to a full
+	render, the shifted part is only off by the rounding of linspace.
+	It's one function next to render_tile instead of a method on every
+	engine class, the strips only need the window every engine takes,
+	and the fallback and the cache stay the same for all of them.
+	"""
+
+	shift = lattice_shift(old_view, new_view, res)
+	if previous.shape != tuple(res) or shift is None or abs(shift[0]) >= res[0] or abs(shift[1]) >= res[1]:
+		grid = render_tile(version, *new_view, res, escape_time, cache=cache, dtype=dtype)
+		return grid, grid.size
+
+	dx, dy = shift
+	# Range of the new grid that was in the previous one
+	x0, x1 = max(0, -dx), min(res[0], res[0] - dx)
+	y0, y1 = max(0, -dy), min(res[1], res[1] - dy)
+	grid = np.empty(res, dtype=previous.dtype)
+	grid[x0:x1, y0:y1] = previous[x0+dx:x1+dx, y0+dy:y1+dy]
+
+	# Exposed columns at full height, then the exposed rows between them
+	strips = [(0, x0, 0, res[1]), (x1, res[0], 0, res[1]),
+			  (x0, x1, 0, y0), (x0, x1, y1, res[1])]
+	computed = 0
+	for window in strips:
+		if window[1] > window[0] and window[3] > window[2]:
+			grid[window[0]:window[1], window[2]:window[3]] = render_tile(
+				version, *new_view, res, escape_time, window, cache, dtype)
+			computed += (window[1] - window[0])*(window[3] - window[2])
+	return grid, computed
+
+
+def split_tiles(res: (int, int), tile_size: (int, int) = (128, 128)) -> list:
+	"""
+	Splits a res grid into windows of at most tile_size pixels.
+	"""
+
+	return [(x0, min(x0+tile_size[0], res[0]), y0, min(y0+tile_size[1], res[1]))
+			for x0 in range(0, res[0], tile_size[0])
+			for y0 in range(0, res[1], tile_size[1])]
+
+
+def render_tiled(version: str, xmin: float, xmax: float,
+				ymin: float, ymax: float, res: (int, int),
+				escape_time: int = 1000, workers: int = None,
+				tile_size: (int, int) = (128, 128),
+				cache: TileCache = None, dtype=np.float64,
+				progress: ProgressReporter = None) -> np.ndarray:
+	"""
+	Renders the image in tiles on a pool of worker processes.
+
+
+	Every tile is computed on the same pixel lattice as a single
+	process run, so the assembled (Nx, Ny) grid is identical to it.
+	workers defaults to the number of cores, with one worker the tiles
+	are rendered in this process. Tiles found in the cache are read
+	from disk and only the rest are handed to the workers. progress is
+	updated as tiles finish, in whatever order that is.
+	"""
+
+	if version not in FLOAT64_ONLY:
+		check_resolution(xmin, xmax, ymin, ymax, res, dtype)
+
+	grid = np.zeros(res)
+	windows = []
+	for window in split_tiles(res, tile_size):
+		tile = None
+		if cache is not None:
+			tile = cache.get(cache.key(version, xmin, xmax, ymin, ymax, res, escape_time, window, dtype))
+		if tile is None:
+			windows.append(window)
+		else:
+			grid[window[0]:window[1], window[2]:window[3]] = tile
+			if progress is not None:
+				progress.update(tile.size, iteration_count(version, tile, escape_time))
+
+	pool = None
+	if workers == 1:
+		results = ((window, render_tile(version, xmin, xmax, ymin, ymax, res, escape_time, window, dtype=dtype))
+				   for window in windows)
+	else:
+		# Spawned, a fork after numba ran its threads here (like the
+		# escape time probe) can hang the workers
+		pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+		futures = {pool.submit(render_tile, version, xmin, xmax, ymin, ymax,
+							   res, escape_time, window, dtype=dtype): window for window in windows}
+		results = ((futures[future], future.result()) for future in as_completed(futures))
+
+	try:
+		for window, tile in results:
+			grid[window[0]:window[1], window[2]:window[3]] = tile
+			if cache is not None:
+				cache.put(cache.key(version, xmin, xmax, ymin, ymax, res, escape_time, window, dtype), tile)
+			if progress is not None:
+				progress.update(tile.size, iteration_count(version, tile, escape_time))
+	finally:
+		if pool is not None:
+			pool.shutdown()
+		if progress is not None:
+			progress.close()
+	return grid
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import time
+import numpy as np
+from numba.core import event
+from metrics import compile_seconds
+from tiled import render_tile
+
+# Engines compiled with numba, per version
+JIT_VERSIONS = ('3', '4', '6', '7')
+
+# Int types of the grids compute_grid can write into
+OUT_DTYPES = (np.int32, np.int64)
+
+
+def timed(func) -> dict:
+	"""
+	Calls func and returns its wall time and the numba compile time
+	inside it, the compile time is about 0 once it's cached.
+	"""
+
+	start = time.perf_counter()
+	with event.install_recorder("numba:compile") as recorder:
+		func()
+	return {"wall_s": time.perf_counter() - start,
+			"compile_s": compile_seconds(recorder.buffer)}
+
+
+def warmup(dtypes=(np.float32, np.float64)) -> dict:
+	"""
+	Compiles every numba kernel for every float type in dtypes, the
+	kernels are cached on disk so later processes only load them.
+
+
+	Every kernel is compiled by a tiny render through the same call
+	the engines make, so the cached signatures are the ones they use.
+	mandelbrot_3 only computes in float64. Returns the times per
+	kernel, see timed.
+	"""
+
+	# Imported here, these modules are only needed to reach their kernels
+	from mandelbrot_parallel import compute_grid
+	from animate import render_seeded
+	from progressive import render_progressive
+	from batch import render_batch
+	import mandelbrot_3
+
+	view = (-2., 1., -1.5, 1.5)
+	res = (8, 8)
+	times = {}
+	for dtype in dtypes:
+		name = np.dtype(dtype).name
+		for version in JIT_VERSIONS:
+			times["v{} {}".format(version, name)] = timed(
+				lambda: render_tile(version, *view, res, 10, dtype=dtype))
+		for out_dtype in OUT_DTYPES:
+			out = np.empty(res, dtype=out_dtype)
+			times["compute_grid {} -> {}".format(name, np.dtype(out_dtype).name)] = timed(
+				lambda: compute_grid(*view, res, 10, out=out, dtype=dtype))
+		# Kernel the scheduler uses, cancel flags are int8
+		times["compute_grid cancellable {}".format(name)] = timed(
+			lambda: compute_grid(*view, res, 10, dtype=dtype, cancel=np.zeros(1, dtype=np.int8)))
+		times["render_seeded {}".format(name)] = timed(
+			lambda: render_seeded(view, res, 10, np.full(res, -1, dtype=np.int32), dtype=dtype))
+		times["render_progressive {}".format(name)] = timed(
+			lambda: render_progressive(*view, res, 10, dtype=dtype))
+		times["render_batch {}".format(name)] = timed(
+			lambda: render_batch([view + (res, 10)], dtype=dtype))
+	if any(np.dtype(dtype) == np.float64 for dtype in dtypes):
+		times["mandelbrot_3 float64"] = timed(lambda: mandelbrot_3.create_grid(*view, res, 10))
+	return times
+
+
+def format_warmup(times: dict) -> str:
+	"""
+	Formats the results of warmup as a table.
+	"""
+
+	lines = ["{:<36}{:>12}{:>10}".format("kernel", "compile s", "wall s")]
+	for name, time_s in times.items():
+		lines.append("{:<36}{:>12.3f}{:>10.3f}".format(name, time_s["compile_s"], time_s["wall_s"]))
+	lines.append("{:<36}{:>12.3f}{:>10.3f}".format("total", sum(t["compile_s"] for t in times.values()),
+												  sum(t["wall_s"] for t in times.values())))
+	return "\n".join(lines)